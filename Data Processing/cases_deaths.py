@@ -1,9 +1,15 @@
 import pandas as pd
+import argparse
 import sys
 import os
+import time
 import pycountry_convert as pc
 import pycountry
 
+import incremental
+import ingest
+import storage
+
 INPUT_DIR = r'Datasets'
 OUTPUT_DIR = os.path.join('Datasets', 'Disease Spread')
 
@@ -12,6 +18,13 @@ COUNTRIES_FILE_PATH = os.path.join(INPUT_DIR,'countries.csv')
 CASES_FILE_PATH = os.path.join(OUTPUT_DIR,'cases.csv')
 DEATHS_FILE_PATH = os.path.join(OUTPUT_DIR,'deaths.csv')
 
+# Names shortened for the outputs (and the watermarks), as {name in cases_deaths.csv: output name}
+COUNTRY_RENAMES = {'World excl. China, South Korea, Japan and Singapore': 'World excl. China South Korea Japan and Singapore'}
+
+# Gaps in these columns are filled with the previous row's value
+FFILL_COLUMNS = ['new_cases', 'new_deaths', 'new_cases_per_million', 'new_deaths_per_million',
+                 'total_cases', 'total_deaths', 'total_cases_per_million', 'total_deaths_per_million']
+
 def get_continent(alpha_3_code):
     try:
         country = pycountry.countries.get(alpha_3=alpha_3_code)
@@ -25,54 +38,122 @@ def get_continent(alpha_3_code):
     except Exception as e:
         return None
 
-def get_values(row):
-    lat = countries_df[countries_df['country']==row.iloc[0]]['latitude'].values[0]
-    long = countries_df[countries_df['country']==row.iloc[0]]['longitude'].values[0]
-    isocode = countries_df[countries_df['country']==row.iloc[0]]['isocode'].values[0]
-    continent = get_continent(isocode)
-
-    return pd.Series([lat, long, isocode, continent])
-
-
-cases_deaths_df = pd.read_csv(CASES_DEATHS_FILE_PATH)
-
-cases_deaths_df['country'] = cases_deaths_df['country'].replace('World excl. China, South Korea, Japan and Singapore',
-                                                  'World excl. China South Korea Japan and Singapore')
-
-cases_deaths_df['date'] = pd.to_datetime(cases_deaths_df['date'])
-cases_deaths_df = cases_deaths_df[cases_deaths_df['date'] <= pd.to_datetime('2024-01-01')]
-cases_deaths_df['new_cases'] = cases_deaths_df['new_cases'].ffill()
-cases_deaths_df['new_deaths'] = cases_deaths_df['new_deaths'].ffill()
-cases_deaths_df['new_cases_per_million'] = cases_deaths_df['new_cases_per_million'].ffill()
-cases_deaths_df['new_deaths_per_million'] = cases_deaths_df['new_deaths_per_million'].ffill()
-
-cases_deaths_df['total_cases'] = cases_deaths_df['total_cases'].ffill()
-cases_deaths_df['total_deaths'] = cases_deaths_df['total_deaths'].ffill()
-cases_deaths_df['total_cases_per_million'] = cases_deaths_df['total_cases_per_million'].ffill()
-cases_deaths_df['total_deaths_per_million'] = cases_deaths_df['total_deaths_per_million'].ffill()
-
-
-cases_columns = ['country', 'date'] + [i for i in cases_deaths_df.columns if 'cases' in i]
-deaths_columns = ['country', 'date'] + [i for i in cases_deaths_df.columns if 'deaths' in i]
-
-countries_df = pd.read_csv(COUNTRIES_FILE_PATH)
-spread_df = cases_deaths_df[['country','date', 'new_cases','total_cases', 'new_deaths', 'total_deaths',
-                             'new_cases_per_million', 'total_cases_per_million',
-                             'new_deaths_per_million', 'total_deaths_per_million']]
-
-cases_df = cases_deaths_df[cases_columns]
-deaths_df = cases_deaths_df[deaths_columns]
-
-cases_df[['latititude', 'longitude', 'isocode','continent']] = cases_df.apply(get_values, axis=1)
-cases_df['date'] = cases_df['date'].astype('str').str.split().str[0]
-cases_df.to_csv(CASES_FILE_PATH, index=False)
-    
-deaths_df[['latititude', 'longitude', 'isocode','continent']] = deaths_df.apply(get_values, axis=1)
-deaths_df['date'] = deaths_df['date'].astype('str').str.split().str[0]
-deaths_df.to_csv(DEATHS_FILE_PATH, index=False)
-
-
-
-
-
-
+def build_country_dimension(countries_df, country_names):
+    """
+    Builds a one-row-per-country table of latitude, longitude, isocode and continent
+    for the given country names, so the per-country lookups run once per country
+    instead of once per country-day.
+    """
+    dimension_df = countries_df.drop_duplicates(subset='country', keep='first').set_index('country')
+    dimension_df = dimension_df.reindex(pd.Index(country_names).unique())
+    missing = dimension_df.index[dimension_df['latitude'].isna() & dimension_df['longitude'].isna()]
+    if len(missing) > 0:
+        raise KeyError(f"Countries missing from {COUNTRIES_FILE_PATH}: {list(missing)}")
+
+    dimension_df = pd.DataFrame({
+        'latititude': dimension_df['latitude'],
+        'longitude': dimension_df['longitude'],
+        'isocode': dimension_df['isocode'],
+        'continent': [get_continent(isocode) for isocode in dimension_df['isocode']],
+    }, index=dimension_df.index)
+    return dimension_df
+
+def enrich(df, dimension_df):
+    return df.join(dimension_df, on='country')
+
+def is_cases_deaths_column(column):
+    return column in ('country', 'date') or 'cases' in column or 'deaths' in column
+
+def load_cases_deaths(memory_limit_mb=ingest.DEFAULT_MEMORY_LIMIT_MB, watermark=None):
+    # Only country, date and the cases/deaths columns are parsed, and only up to 2024-01-01
+    # (and after each country's watermark in an incremental run)
+    newer_than = None
+    if watermark is not None:
+        newer_than = watermark.rename(index={new: old for old, new in COUNTRY_RENAMES.items()})
+    cases_deaths_df = ingest.read_filtered(CASES_DEATHS_FILE_PATH, columns=is_cases_deaths_column, newer_than=newer_than,
+                                           max_date='2024-01-01', memory_limit_mb=memory_limit_mb)
+
+    cases_deaths_df['country'] = cases_deaths_df['country'].replace(COUNTRY_RENAMES)
+
+    cases_deaths_df['date'] = pd.to_datetime(cases_deaths_df['date'])
+    return cases_deaths_df
+
+def last_written_rows(output_format='csv'):
+    """Each country's FFILL_COLUMNS in its latest row of the existing cases and deaths outputs."""
+    last_rows = []
+    for path, kind in [(CASES_FILE_PATH, 'cases'), (DEATHS_FILE_PATH, 'deaths')]:
+        # The CSV keeps the full precision; with --format parquet the outputs are float32 anyway
+        path = storage.output_paths(path, output_format)[0]
+        columns = ['country', 'date'] + [column for column in FFILL_COLUMNS if kind in column]
+        df = pd.read_parquet(path, columns=columns) if path.endswith('.parquet') else pd.read_csv(path, usecols=columns)
+        df['country'] = df['country'].astype(str)
+        df['date'] = pd.to_datetime(df['date'])
+        last_rows.append(df.sort_values('date', kind='stable').groupby('country').tail(1).set_index('country')[columns[2:]])
+    return pd.concat(last_rows, axis=1)
+
+def forward_fill(cases_deaths_df, last_rows_df=None):
+    """
+    Fills gaps in FFILL_COLUMNS with the previous row of the same country. In an incremental
+    run a country's leading gaps continue from its last row already written (last_rows_df).
+    """
+    filled = cases_deaths_df.groupby('country', sort=False)[FFILL_COLUMNS].ffill()
+    if last_rows_df is not None:
+        filled = filled.fillna(cases_deaths_df[['country']].join(last_rows_df, on='country')[FFILL_COLUMNS])
+    cases_deaths_df[FFILL_COLUMNS] = filled
+    return cases_deaths_df
+
+def split_cases_deaths(cases_deaths_df):
+    cases_columns = ['country', 'date'] + [i for i in cases_deaths_df.columns if 'cases' in i]
+    deaths_columns = ['country', 'date'] + [i for i in cases_deaths_df.columns if 'deaths' in i]
+    return cases_deaths_df[cases_columns], cases_deaths_df[deaths_columns]
+
+def save(df, path, output_format='csv'):
+    storage.write_table(df, path, output_format, date_columns=['date'],
+                        category_columns=['country', 'isocode', 'continent'], date_format='%Y-%m-%d')
+
+def append(df, path, output_format='csv'):
+    storage.append_table(df, path, output_format, date_columns=['date'],
+                         category_columns=['country', 'isocode', 'continent'], date_format='%Y-%m-%d')
+
+def main(output_format='csv', incremental_run=False, memory_limit_mb=ingest.DEFAULT_MEMORY_LIMIT_MB):
+    watermark = None
+    if incremental_run:
+        outputs = storage.output_paths(CASES_FILE_PATH, output_format) + storage.output_paths(DEATHS_FILE_PATH, output_format)
+        watermark = incremental.resume_point('cases_deaths', outputs)
+        if watermark is None:
+            print("No previous run to continue from, rebuilding the full history")
+
+    cases_deaths_df = load_cases_deaths(memory_limit_mb, watermark)
+    if watermark is not None and cases_deaths_df.empty:
+        print(f"Already up to date with {watermark.max().date()}")
+        return
+    latest = incremental.latest_dates(cases_deaths_df)
+    cases_deaths_df = forward_fill(cases_deaths_df, None if watermark is None else last_written_rows(output_format))
+    # The outputs are sorted by country and date, the order storage.append_table() keeps
+    cases_deaths_df = cases_deaths_df.sort_values(['country', 'date'], kind='stable', ignore_index=True)
+
+    countries_df = pd.read_csv(COUNTRIES_FILE_PATH)
+    cases_df, deaths_df = split_cases_deaths(cases_deaths_df)
+
+    start = time.perf_counter()
+    country_dimension_df = build_country_dimension(countries_df, cases_deaths_df['country'])
+    cases_df = enrich(cases_df, country_dimension_df)
+    deaths_df = enrich(deaths_df, country_dimension_df)
+    print(f"Enriched {len(cases_df) + len(deaths_df)} rows from {len(country_dimension_df)} countries in {time.perf_counter() - start:.2f}s")
+
+    if watermark is not None:
+        append(cases_df, CASES_FILE_PATH, output_format)
+        append(deaths_df, DEATHS_FILE_PATH, output_format)
+        print(f"Appended {len(cases_df)} new rows")
+    else:
+        save(cases_df, CASES_FILE_PATH, output_format)
+        save(deaths_df, DEATHS_FILE_PATH, output_format)
+    incremental.save_watermark('cases_deaths', latest, watermark)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Builds cases.csv and deaths.csv for the Disease Spread page.')
+    storage.add_format_argument(parser)
+    incremental.add_incremental_argument(parser)
+    ingest.add_memory_argument(parser)
+    args = parser.parse_args()
+    main(args.format, args.incremental, args.memory_limit)
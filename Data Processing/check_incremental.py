@@ -0,0 +1,180 @@
+"""
+Checks that an incremental run followed by an append gives the same outputs as a full rebuild.
+
+Every script with an --incremental mode is run on small synthetic inputs inside a
+temporary directory: a full build on the rows up to CUTOFF_DATE, then an incremental run on
+all rows, and the outputs are compared with a full build on all rows. The spread.csv
+fixture has a country that reports daily with a gap across the cut-off, one that reports
+weekly and one whose rows before the cut-off are a month apart, so a look-back that reads
+too few rows of any country changes the appended values. The cases_deaths.csv fixture has
+missing values right after the cut-off and at the start of a country, for the forward fill.
+The countries in LATE_REPORTS report late: their last rows before the cut-off only reach
+the incremental run, after other countries have moved past those dates.
+
+The Parquet copies must match the full rebuild row for row. The CSVs have appended rows at
+the end, so they are compared sorted by country and date, after checking that every
+country's rows are still in date order.
+
+Run from anywhere:
+    python "Data Processing/check_incremental.py"
+    python "Data Processing/check_incremental.py" --format both
+"""
+import argparse
+import os
+import sys
+import tempfile
+import pandas as pd
+
+import cases_deaths
+import daily_analysis_data
+import incremental
+import recovery_data
+import spread_data
+import storage
+
+CUTOFF_DATE = pd.Timestamp('2020-06-30')
+
+# Days before CUTOFF_DATE whose rows of the country are missing from the first build's inputs
+LATE_REPORTS = {'Weeklyland': 21, 'Chile': 10}
+
+def country_rows(country, dates, population):
+    """
+    Cumulative series for one country. The new values are zero every fifth row and on the
+    first of every month, the first row after CUTOFF_DATE, for diff() to fill in.
+    """
+    zero = [i % 5 == 0 or date.day == 1 for i, date in enumerate(dates)]
+    new_cases = [0 if zero[i] else (i * 37 + len(country) * 11) % 90 + 5 for i in range(len(dates))]
+    new_deaths = [0 if zero[i] else (i * 7 + len(country)) % 6 + 1 for i in range(len(dates))]
+    df = pd.DataFrame({'country': country, 'date': dates, 'new_cases': new_cases, 'new_deaths': new_deaths})
+    df['total_cases'] = df['new_cases'].cumsum() + df.index + 1
+    df['total_deaths'] = df['new_deaths'].cumsum() + df.index
+    for column in ['new_cases', 'new_deaths', 'total_cases', 'total_deaths']:
+        df[f'{column}_per_million'] = df[column] / population * 1e6
+    return df
+
+def spread_fixture():
+    days = pd.date_range('2020-03-01', '2020-09-30')
+    monthly = pd.date_range('2019-01-15', '2020-05-15', freq='MS') + pd.Timedelta(days=14)
+    df = pd.concat([
+        country_rows('Dailyland', days[(days < '2020-06-20') | (days >= '2020-07-01')], 5e6),
+        country_rows('Weeklyland', pd.date_range('2020-03-01', '2020-09-30', freq='7D'), 2e6),
+        country_rows('Sparseland', monthly.append(pd.date_range('2020-07-01', '2020-08-31')), 1e6),
+        country_rows('World', days, 8e9),
+    ], ignore_index=True)
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return df[['country', 'date', 'new_cases', 'total_cases', 'new_deaths', 'total_deaths',
+               'new_cases_per_million', 'new_deaths_per_million', 'total_cases_per_million', 'total_deaths_per_million']]
+
+def cases_deaths_fixture():
+    days = pd.date_range('2020-03-01', '2020-09-30')
+    df = pd.concat([
+        country_rows('France', days, 6.7e7),
+        country_rows('Japan', days[::7], 1.25e8),
+        country_rows('Chile', days[days >= '2020-04-01'], 1.9e7),
+    ], ignore_index=True)
+    df['weekly_cases'] = df.groupby('country')['new_cases'].transform(lambda s: s.rolling(7, min_periods=1).sum())
+    df['weekly_deaths'] = df.groupby('country')['new_deaths'].transform(lambda s: s.rolling(7, min_periods=1).sum())
+    # Gaps the forward fill has to bridge: France's first days after the cut-off, Japan's
+    # first report after it, and Chile's first rows, which follow Japan's last in the file
+    first_dates = df.groupby('country')['date'].transform('min')
+    gaps = (((df['country'] == 'France') & df['date'].between('2020-07-01', '2020-07-03'))
+            | ((df['country'] == 'Japan') & (df['date'] > CUTOFF_DATE) & (df['date'] <= CUTOFF_DATE + pd.Timedelta(days=7)))
+            | ((df['country'] == 'Chile') & (df['date'] < first_dates + pd.Timedelta(days=3))))
+    df.loc[gaps, cases_deaths.FFILL_COLUMNS] = None
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return df
+
+def countries_fixture():
+    return pd.DataFrame({'country': ['France', 'Japan', 'Chile'], 'isocode': ['FRA', 'JPN', 'CHL'],
+                         'latitude': [46.2, 36.2, -35.7], 'longitude': [2.2, 138.3, -71.5]})
+
+# (name, build(output_format, incremental_run), inputs, outputs) for every incremental script
+CHECKS = [
+    ('cases_deaths', cases_deaths.main,
+     {cases_deaths.CASES_DEATHS_FILE_PATH: cases_deaths_fixture, cases_deaths.COUNTRIES_FILE_PATH: countries_fixture},
+     [cases_deaths.CASES_FILE_PATH, cases_deaths.DEATHS_FILE_PATH]),
+    ('daily_analysis_data', daily_analysis_data.clean_temporal_data,
+     {daily_analysis_data.INPUT_PATH: spread_fixture}, [daily_analysis_data.OUTPUT_PATH]),
+    ('recovery_data', recovery_data.compute_recovery_estimates,
+     {daily_analysis_data.INPUT_PATH: spread_fixture}, [recovery_data.output_path]),
+    ('spread_data', spread_data.main,
+     {daily_analysis_data.INPUT_PATH: spread_fixture}, [daily_analysis_data.OUTPUT_PATH, recovery_data.output_path]),
+]
+
+def write_inputs(inputs, cutoff_date=None):
+    """
+    Writes every input fixture, keeping only the rows up to cutoff_date when given, less
+    the rows of the LATE_REPORTS countries that have not been reported by then.
+    """
+    for path, df in inputs.items():
+        if cutoff_date is not None and 'date' in df.columns:
+            dates = pd.to_datetime(df['date'])
+            reported = cutoff_date - pd.to_timedelta(df['country'].map(LATE_REPORTS).fillna(0), unit='D')
+            df = df[dates <= reported]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_csv(path, index=False)
+
+def read_outputs(outputs, output_format):
+    """
+    Every output file; the CSVs sorted by country and date since appended rows come after
+    the older ones, or None when a country's rows are out of date order.
+    """
+    frames = {}
+    for output in outputs:
+        for path in storage.output_paths(output, output_format):
+            if path.endswith('.parquet'):
+                frames[path] = pd.read_parquet(path)
+                continue
+            df = pd.read_csv(path)
+            in_order = pd.to_datetime(df['date']).groupby(df['country']).is_monotonic_increasing.all()
+            frames[path] = df.sort_values(['country', 'date']).reset_index(drop=True) if in_order else None
+    return frames
+
+def check(build, inputs, outputs, output_format):
+    """Returns the output paths whose incremental build differs from the full rebuild."""
+    write_inputs(inputs, CUTOFF_DATE)
+    build(output_format, False)
+    write_inputs(inputs)
+    build(output_format, True)
+    appended = read_outputs(outputs, output_format)
+
+    os.remove(incremental.WATERMARKS_FILE_PATH)
+    build(output_format, False)
+    rebuilt = read_outputs(outputs, output_format)
+
+    different = []
+    for path, df in rebuilt.items():
+        if appended[path] is None:
+            print(f"{path}: rows of a country are out of date order")
+            different.append(path)
+            continue
+        try:
+            pd.testing.assert_frame_equal(appended[path], df)
+        except AssertionError as e:
+            print(f"{path}: {e}")
+            different.append(path)
+    return different
+
+def main(output_format='csv'):
+    cwd = os.getcwd()
+    report = []
+    for name, build, fixtures, outputs in CHECKS:
+        inputs = {path: fixture() for path, fixture in fixtures.items()}
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                different = check(build, inputs, outputs, output_format)
+            finally:
+                os.chdir(cwd)
+        report.append((name, 'differs: ' + ', '.join(different) if different else 'ok'))
+
+    print("-" * 60)
+    for name, status in report:
+        print(f"{name:<25} {status}")
+    return all(status == 'ok' for _, status in report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Checks that incremental runs append the same rows a full rebuild writes.')
+    storage.add_format_argument(parser)
+    args = parser.parse_args()
+    sys.exit(0 if main(args.format) else 1)
@@ -1,21 +1,25 @@
 import os
+import argparse
 import pandas as pd
 
+import incremental
+import storage
+
 # Set file paths
 INPUT_PATH = os.path.join("Datasets", "spread.csv")
 OUTPUT_PATH = os.path.join("Datasets", "Daily Analysis","daily_analysis_data.csv")
 
-def clean_temporal_data():
-    print("📥 Loading spread.csv ...")
-    df = pd.read_csv(INPUT_PATH)
+# Rows of every country an incremental run reads before its watermark so that the first
+# new row still has the previous row for diff()
+LOOKBACK_ROWS = 1
 
-    # Convert date to datetime and sort
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values(by=["country", "date"])
+DATASET = "daily_analysis"
 
+def derive_daily_analysis(df):
+    """Cleaned daily series from a spread.csv frame sorted by country and date."""
     # Remove aggregate regions (not actual countries)
     aggregates = ["World", "Asia", "Europe", "Africa", "North America", "South America", "Oceania", "European Union"]
-    df = df[~df["country"].isin(aggregates)]
+    df = df[~df["country"].isin(aggregates)].copy()
 
     # Ensure total columns have no NaN
     df["total_cases"] = df["total_cases"].fillna(0)
@@ -38,12 +42,45 @@ def clean_temporal_data():
 
     #  Drop per-million columns if present
     df.drop(columns=["new_cases_per_million", "new_deaths_per_million"], errors="ignore", inplace=True)
+    return df
 
-    #  Save cleaned dataset
-    os.makedirs("Datasets", exist_ok=True)
-    df.to_csv(OUTPUT_PATH, index=False)
-    print(f"✅ Cleaned daily analysis data saved to {OUTPUT_PATH}")
+def save_daily_analysis(df, output_format, watermark, latest):
+    """Writes the cleaned series, or appends its rows after the watermark, and moves the watermark."""
+    if watermark is not None:
+        df = df[incremental.is_new(df, watermark)]
+        storage.append_table(df, OUTPUT_PATH, output_format, date_columns=["date"], category_columns=["country"])
+        print(f"✅ Appended {len(df)} new rows to {', '.join(storage.output_paths(OUTPUT_PATH, output_format))}")
+    else:
+        storage.write_table(df, OUTPUT_PATH, output_format, date_columns=["date"], category_columns=["country"])
+        print(f"✅ Cleaned daily analysis data saved to {', '.join(storage.output_paths(OUTPUT_PATH, output_format))}")
+    incremental.save_watermark(DATASET, latest, watermark)
+
+def clean_temporal_data(output_format="csv", incremental_run=False):
+    print("📥 Loading spread.csv ...")
+    df = pd.read_csv(INPUT_PATH)
+
+    # Convert date to datetime and sort
+    df["date"] = pd.to_datetime(df["date"])
+    latest = incremental.latest_dates(df)
+
+    watermark = None
+    if incremental_run:
+        watermark = incremental.resume_point(DATASET, storage.output_paths(OUTPUT_PATH, output_format))
+        if watermark is None:
+            print("No previous run to continue from, rebuilding the full history")
+        elif not incremental.is_new(df, watermark).any():
+            print(f"✅ Already up to date with {watermark.max().date()}")
+            return
+
+    df = df.sort_values(by=["country", "date"])
+    if watermark is not None:
+        df = incremental.lookback_rows(df, watermark, LOOKBACK_ROWS)
+    save_daily_analysis(derive_daily_analysis(df), output_format, watermark, latest)
 
 # ✅ Fix entry point
 if __name__ == "__main__":
-    clean_temporal_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Builds daily_analysis_data.csv from spread.csv.")
+    storage.add_format_argument(parser)
+    incremental.add_incremental_argument(parser)
+    args = parser.parse_args()
+    clean_temporal_data(args.format, args.incremental)
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Builds the entity dimension shared by the pages, Datasets/Entities/entities.csv: one row
+per country or aggregate name found in the datasets, with
+
+    iso3          ISO 3166 alpha-3 code of a country (OWID_* codes kept as they are)
+    continent     continent of a country, or the continent an aggregate stands for
+    entity_type   country, continent, income_group, world or region (any other aggregate,
+                  e.g. European Union (27) or World excl. China)
+    is_aggregate  True for everything that is not a country
+    latitude, longitude
+
+Names are classified by utils/entity_types.py, which the pages also use for names the
+dimension does not contain. Every source, countries.csv included, is optional: the
+dimension is built from whichever of them exist.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+import pandas as pd
+import pycountry
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cases_deaths
+import storage
+from utils.entity_types import CONTINENTS, ENTITY_TYPES, entity_type
+
+ENTITIES_FILE_PATH = os.path.join('Datasets', 'Entities', 'entities.csv')
+
+# Datasets whose country names are added to the dimension when they exist
+ENTITY_SOURCES = [
+    cases_deaths.CASES_FILE_PATH,
+    os.path.join('Datasets', 'Daily Analysis', 'daily_analysis_data.csv'),
+    os.path.join('Datasets', 'Daily Analysis', 'active_cases_and_estimated_recovery_data.csv'),
+    os.path.join('Datasets', 'Daily Analysis', 'daily_vaccinations_and_icu_all_countries_data.csv'),
+    os.path.join('Datasets', 'Vaccination', 'final.csv'),
+    os.path.join('Datasets', 'Testing', 'Testing_Impact_Analysis.csv'),
+    os.path.join('Datasets', 'Mobility Analysis', 'cleaned_data.parquet'),
+]
+
+# OWID country names without an isocode that pycountry spells differently
+ISO3_OVERRIDES = {'Curacao': 'CUW', 'Falkland Islands': 'FLK'}
+
+def iso3_code(name, isocode):
+    """The isocode from countries.csv, or a pycountry name lookup for countries that have none."""
+    if pd.notna(isocode) and isocode != 'None':
+        return isocode
+    if name in ISO3_OVERRIDES:
+        return ISO3_OVERRIDES[name]
+    try:
+        return pycountry.countries.lookup(name).alpha_3
+    except LookupError:
+        return None
+
+def source_names(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=['country'])['country']
+    return pd.read_csv(path, usecols=['country'])['country']
+
+def build_entities(countries_df, names):
+    countries_df = countries_df.drop_duplicates(subset='country', keep='first').set_index('country')
+    names = pd.Index(countries_df.index.union(pd.Index(names).dropna().unique()), name='country')
+    countries_df = countries_df.reindex(names)
+
+    entities_df = pd.DataFrame({'entity_type': [entity_type(name) for name in names]}, index=names)
+    is_country = entities_df['entity_type'] == 'country'
+    entities_df['iso3'] = [iso3_code(name, isocode) if country else None
+                           for name, isocode, country in zip(names, countries_df['isocode'], is_country)]
+    entities_df['continent'] = [cases_deaths.get_continent(iso3) if country else (name if name in CONTINENTS else None)
+                                for name, iso3, country in zip(names, entities_df['iso3'], is_country)]
+    entities_df['is_aggregate'] = ~is_country
+    entities_df['latitude'] = countries_df['latitude']
+    entities_df['longitude'] = countries_df['longitude']
+    return entities_df[['iso3', 'continent', 'entity_type', 'is_aggregate', 'latitude', 'longitude']].reset_index()
+
+def main(output_format='csv'):
+    if os.path.exists(cases_deaths.COUNTRIES_FILE_PATH):
+        countries_df = pd.read_csv(cases_deaths.COUNTRIES_FILE_PATH)
+    else:
+        countries_df = pd.DataFrame(columns=['country', 'isocode', 'latitude', 'longitude'])
+    names = [source_names(path) for path in ENTITY_SOURCES if os.path.exists(path)]
+    entities_df = build_entities(countries_df, pd.concat(names) if names else [])
+
+    storage.write_table(entities_df, ENTITIES_FILE_PATH, output_format,
+                        category_columns=['iso3', 'continent', 'entity_type'])
+    counts = entities_df['entity_type'].value_counts()
+    print(f"🏷️ {len(entities_df)} entities ({', '.join(f'{counts.get(t, 0)} {t}' for t in ENTITY_TYPES)}) "
+          f"saved to {', '.join(storage.output_paths(ENTITIES_FILE_PATH, output_format))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Builds the entity dimension (ISO3, continent, aggregate flags) for the pages.')
+    storage.add_format_argument(parser)
+    main(parser.parse_args().format)
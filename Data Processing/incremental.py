@@ -0,0 +1,71 @@
+"""
+High-water marks for the --incremental mode of the Data Processing scripts.
+
+After every run a script records, for every country, the latest input date it has
+processed. An incremental run only derives the rows dated after their country's mark (and
+every row of a country it has not seen), reading just enough earlier rows of every country
+for its look-back (a diff or a lag), and appends them to the existing outputs. Keeping one
+mark per country means a country that reports late is still picked up once its rows arrive.
+The look-back is counted in rows, not days, since countries report on different
+schedules. A full run (without --incremental) rebuilds the outputs and resets the marks,
+so use it after upstream revisions to already processed dates.
+"""
+import json
+import os
+import pandas as pd
+
+WATERMARKS_FILE_PATH = os.path.join('Datasets', '.watermarks.json')
+
+def add_incremental_argument(parser):
+    parser.add_argument('--incremental', action='store_true',
+                        help='only process rows newer than the last run and append them to the outputs')
+
+def load_watermarks():
+    if os.path.exists(WATERMARKS_FILE_PATH):
+        with open(WATERMARKS_FILE_PATH) as f:
+            return json.load(f)
+    return {}
+
+def latest_dates(df, key_col='country', date_col='date'):
+    """The latest date of every country in df, to record with save_watermark()."""
+    return df.groupby(key_col, observed=True)[date_col].max()
+
+def save_watermark(dataset, latest, previous=None):
+    """
+    Records the marks of a run: latest (dates by country) on top of the previous marks the
+    run continued from, or alone after a full run. A country's mark never moves back.
+    """
+    marks = pd.Series(pd.to_datetime(latest.to_numpy()), index=latest.index.astype(str))
+    if previous is not None:
+        marks = pd.concat([previous, marks]).groupby(level=0).max()
+    watermarks = load_watermarks()
+    watermarks[dataset] = {country: date.strftime('%Y-%m-%d') for country, date in marks.items()}
+    os.makedirs(os.path.dirname(WATERMARKS_FILE_PATH), exist_ok=True)
+    with open(WATERMARKS_FILE_PATH, 'w') as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+
+def resume_point(dataset, outputs):
+    """
+    The marks an incremental run continues from (a Series of dates indexed by country), or
+    None when a full rebuild is needed because the dataset was never built, one of its
+    outputs is missing or it was recorded with the single mark of older versions.
+    """
+    marks = load_watermarks().get(dataset)
+    if not isinstance(marks, dict) or not all(os.path.exists(path) for path in outputs):
+        return None
+    return pd.Series(pd.to_datetime(list(marks.values())), index=list(marks.keys()), dtype='datetime64[ns]')
+
+def is_new(df, watermark, key_col='country', date_col='date'):
+    """True for the rows of df dated after their country's mark and for every row of a country without one."""
+    marks = pd.to_datetime(df[key_col].astype(str).map(watermark))
+    return (marks.isna() | (df[date_col] > marks)).to_numpy()
+
+def lookback_rows(df, watermark, rows, key_col='country', date_col='date'):
+    """
+    The new rows (see is_new()) plus each country's last `rows` rows at or before its mark,
+    however far back those are. df must be sorted by key_col and date_col; the rows keep
+    their order.
+    """
+    new = is_new(df, watermark, key_col, date_col)
+    earlier = df[~new].groupby(key_col, sort=False, observed=True).tail(rows).index
+    return df[new | df.index.isin(earlier)]
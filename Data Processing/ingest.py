@@ -0,0 +1,86 @@
+"""
+Chunked reading of the raw OWID / Economist CSVs with a bounded memory footprint.
+
+read_filtered() streams a CSV in chunks, keeps only the requested columns while parsing
+and applies the date and country filters to every chunk, so only the rows and columns
+the ETL uses are ever held in memory. The chunk size is derived from a memory ceiling
+(--memory-limit, or the INGEST_MEMORY_LIMIT_MB environment variable), and a MemoryError
+is raised if the filtered result plus one chunk would not fit under it.
+"""
+import os
+import pandas as pd
+
+DEFAULT_MEMORY_LIMIT_MB = int(os.environ.get('INGEST_MEMORY_LIMIT_MB', 1024))
+
+# Share of the ceiling a single raw chunk may take; the rest is left for the kept rows
+CHUNK_SHARE = 0.25
+SAMPLE_ROWS = 1000
+MIN_CHUNK_ROWS = 1000
+
+def add_memory_argument(parser):
+    parser.add_argument('--memory-limit', type=int, default=DEFAULT_MEMORY_LIMIT_MB, metavar='MB',
+                        help=f'peak memory for reading the raw files (default: {DEFAULT_MEMORY_LIMIT_MB} MB)')
+
+def _usecols(columns, drop_columns):
+    if columns is not None:
+        return columns if callable(columns) else list(columns)
+    if drop_columns is not None:
+        drop_columns = set(drop_columns)
+        return lambda column: column not in drop_columns
+    return None
+
+def chunk_rows(path, usecols=None, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    """Rows per chunk so that one parsed chunk takes about CHUNK_SHARE of the ceiling."""
+    sample = pd.read_csv(path, usecols=usecols, nrows=SAMPLE_ROWS)
+    if len(sample) == 0:
+        return MIN_CHUNK_ROWS
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    return max(MIN_CHUNK_ROWS, int(memory_limit_mb * 2**20 * CHUNK_SHARE / bytes_per_row))
+
+def read_filtered(path, columns=None, drop_columns=None, date_col='date', min_date=None, max_date=None,
+                  countries=None, country_col='country', newer_than=None, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    """
+    Reads path chunk by chunk, keeping the given columns (a list, returned in that order, or
+    a predicate on the column name) or all but drop_columns, and only the rows with
+    min_date <= date_col <= max_date and country_col in countries. newer_than (dates indexed
+    by country, e.g. incremental watermarks) also drops the rows of the countries it lists
+    dated at or before their date. Dates are compared as parsed datetimes but returned as
+    they appear in the file. The rows keep their file order, so the result equals filtering
+    the fully loaded file.
+    """
+    usecols = _usecols(columns, drop_columns)
+    rows = chunk_rows(path, usecols, memory_limit_mb)
+    limit_bytes = memory_limit_mb * 2**20
+    if countries is not None:
+        countries = set(countries)
+
+    kept, kept_bytes, rows_read = [], 0, 0
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=rows):
+        rows_read += len(chunk)
+        chunk_bytes = chunk.memory_usage(deep=True).sum()
+        mask = pd.Series(True, index=chunk.index)
+        if min_date is not None or max_date is not None or newer_than is not None:
+            dates = pd.to_datetime(chunk[date_col])
+            if min_date is not None:
+                mask &= dates >= pd.to_datetime(min_date)
+            if max_date is not None:
+                mask &= dates <= pd.to_datetime(max_date)
+        if countries is not None:
+            mask &= chunk[country_col].isin(countries)
+        if newer_than is not None:
+            marks = pd.to_datetime(chunk[country_col].map(newer_than))
+            mask &= marks.isna() | (dates > marks)
+        chunk = chunk[mask]
+
+        kept_bytes += chunk.memory_usage(deep=True).sum()
+        if kept_bytes + chunk_bytes > limit_bytes:
+            raise MemoryError(f"{path}: the filtered rows need more than the {memory_limit_mb} MB memory limit; "
+                              f"raise --memory-limit or narrow the date/country filters")
+        kept.append(chunk)
+
+    df = pd.concat(kept, ignore_index=True) if kept else pd.read_csv(path, usecols=usecols, nrows=0)
+    if isinstance(usecols, list):
+        df = df[usecols]
+    print(f"📥 {os.path.basename(path)}: kept {len(df)} of {rows_read} rows and {len(df.columns)} columns "
+          f"({kept_bytes / 2**20:.1f} MB, {len(kept)} chunks of {rows} rows)")
+    return df
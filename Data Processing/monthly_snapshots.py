@@ -0,0 +1,61 @@
+"""
+Materializes the monthly tables behind the choropleth animations, so the pages load them
+directly instead of aggregating the daily data on first paint:
+
+    Disease Spread/cases_monthly.csv, deaths_monthly.csv
+        one row per country and month: the last day of the month with complete data
+        (page 1, Map Visualization tab)
+    Daily Analysis/recovery_monthly.csv
+        the mean estimated recovery rate per month and country (page 7.2)
+"""
+import argparse
+import os
+import pandas as pd
+
+import cases_deaths
+import recovery_data
+import storage
+
+CASES_MONTHLY_FILE_PATH = os.path.join(cases_deaths.OUTPUT_DIR, 'cases_monthly.csv')
+DEATHS_MONTHLY_FILE_PATH = os.path.join(cases_deaths.OUTPUT_DIR, 'deaths_monthly.csv')
+RECOVERY_MONTHLY_FILE_PATH = os.path.join('Datasets', 'Daily Analysis', 'recovery_monthly.csv')
+
+SNAPSHOT_COLUMNS = ['country', 'date', '{metric}', '{metric}_per_million', 'isocode', 'continent']
+
+def month_end_snapshots(df):
+    """
+    Last row of every country and month among the rows with no missing value, in the same
+    row order (country, then month) as the groupby the page used to run.
+    """
+    df = df.dropna().copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values(['country', 'date'], kind='stable')
+    month = df['date'].dt.to_period('M')
+    last_of_month = (df['country'] != df['country'].shift(-1)) | (month != month.shift(-1))
+    return df[last_of_month].reset_index(drop=True)
+
+def monthly_recovery_rate(df):
+    df = df[['date', 'country', 'estimated_recovery_rate']].copy()
+    df['month'] = pd.to_datetime(df['date']).dt.to_period('M').dt.to_timestamp()
+    return df.groupby(['month', 'country'], as_index=False)['estimated_recovery_rate'].mean()
+
+def build_spread_snapshot(input_path, output_path, metric, output_format):
+    columns = [column.format(metric=metric) for column in SNAPSHOT_COLUMNS]
+    snapshot_df = month_end_snapshots(pd.read_csv(input_path, usecols=columns)[columns])
+    storage.write_table(snapshot_df, output_path, output_format, date_columns=['date'],
+                        category_columns=['country', 'isocode', 'continent'], date_format='%Y-%m-%d')
+    print(f"🗺️ {len(snapshot_df)} monthly snapshots saved to {', '.join(storage.output_paths(output_path, output_format))}")
+
+def main(output_format='csv'):
+    build_spread_snapshot(cases_deaths.CASES_FILE_PATH, CASES_MONTHLY_FILE_PATH, 'total_cases', output_format)
+    build_spread_snapshot(cases_deaths.DEATHS_FILE_PATH, DEATHS_MONTHLY_FILE_PATH, 'total_deaths', output_format)
+
+    recovery_df = monthly_recovery_rate(pd.read_csv(recovery_data.output_path))
+    storage.write_table(recovery_df, RECOVERY_MONTHLY_FILE_PATH, output_format, date_columns=['month'],
+                        category_columns=['country'], date_format='%Y-%m-%d')
+    print(f"🗺️ {len(recovery_df)} monthly recovery rates saved to {', '.join(storage.output_paths(RECOVERY_MONTHLY_FILE_PATH, output_format))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Builds the monthly tables for the choropleth animations.')
+    storage.add_format_argument(parser)
+    main(parser.parse_args().format)
@@ -0,0 +1,263 @@
+"""
+Runs the Data Processing scripts as a dependency graph.
+
+Every stage declares the files it reads and writes. A stage is fingerprinted from the
+content hash of its scripts and its input files, and it is skipped when the fingerprint
+matches the one recorded after its last successful run and all of its outputs still
+exist. Stages whose inputs are produced by another stage wait for it; all other stages
+run concurrently in a process pool.
+
+Run from the repository root:
+    python "Data Processing/pipeline.py"                 # rebuild only what changed
+    python "Data Processing/pipeline.py" --force         # rebuild everything
+    python "Data Processing/pipeline.py" --dry-run       # show what would run
+    python "Data Processing/pipeline.py" cases_deaths    # only the named stages
+    python "Data Processing/pipeline.py" --format both   # also write typed Parquet copies
+    python "Data Processing/pipeline.py" --incremental   # append only new dates where supported
+"""
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import runpy
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import storage
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPTS_DIR)
+STATE_FILE_PATH = os.path.join('Datasets', '.pipeline_state.json')
+
+Stage = namedtuple('Stage', ['name', 'scripts', 'inputs', 'outputs', 'incremental', 'optional_inputs'],
+                   defaults=[False, ()])
+
+# scripts: the stage's entry script first, then any local modules it imports.
+# inputs/outputs: paths relative to the repository root; inputs may be glob patterns.
+# outputs are the CSV paths; with --format parquet/both their Parquet siblings are expected too.
+# incremental: the script accepts --incremental and can append new dates to its outputs.
+# optional_inputs: read when present. They are fingerprinted and waited for like inputs,
+# but a missing one, or a failed stage producing one, does not stop the stage.
+STAGES = [
+    Stage('mortality',
+          scripts=['dataset_files_preprocessor.py', 'ingest.py', 'interpolation.py', 'storage.py'],
+          inputs=[os.path.join('Primary_Datasets_Raw', '*.csv')],
+          outputs=[os.path.join('Datasets', 'Mortality_Analysis', 'national_data.csv'),
+                   os.path.join('Datasets', 'Mortality_Analysis', 'global_mean_data.csv')]),
+    Stage('cases_deaths',
+          scripts=['cases_deaths.py', 'incremental.py', 'ingest.py', 'storage.py'],
+          inputs=[os.path.join('Datasets', 'cases_deaths.csv'),
+                  os.path.join('Datasets', 'countries.csv')],
+          outputs=[os.path.join('Datasets', 'Disease Spread', 'cases.csv'),
+                   os.path.join('Datasets', 'Disease Spread', 'deaths.csv')],
+          incremental=True),
+    Stage('spread',
+          scripts=['spread_data.py', 'daily_analysis_data.py', 'recovery_data.py', 'incremental.py', 'storage.py'],
+          inputs=[os.path.join('Datasets', 'spread.csv')],
+          outputs=[os.path.join('Datasets', 'Daily Analysis', 'daily_analysis_data.csv'),
+                   os.path.join('Datasets', 'active_cases_and_estimated_recovery_data.csv')],
+          incremental=True),
+    Stage('monthly_snapshots',
+          scripts=['monthly_snapshots.py', 'cases_deaths.py', 'recovery_data.py', 'storage.py'],
+          inputs=[os.path.join('Datasets', 'Disease Spread', 'cases.csv'),
+                  os.path.join('Datasets', 'Disease Spread', 'deaths.csv'),
+                  os.path.join('Datasets', 'active_cases_and_estimated_recovery_data.csv')],
+          outputs=[os.path.join('Datasets', 'Disease Spread', 'cases_monthly.csv'),
+                   os.path.join('Datasets', 'Disease Spread', 'deaths_monthly.csv'),
+                   os.path.join('Datasets', 'Daily Analysis', 'recovery_monthly.csv')]),
+    Stage('vaccination_icu',
+          scripts=['vaccination_icu_data.py', 'ingest.py', 'storage.py'],
+          inputs=[os.path.join('Datasets', 'vaccinations_global.csv'),
+                  os.path.join('Datasets', 'hospital.csv')],
+          outputs=[os.path.join('Datasets', 'Daily Analysis', 'daily_vaccinations_and_icu_all_countries_data.csv')]),
+    # Built from whichever of its sources exist, including the page datasets no stage produces
+    Stage('entities',
+          scripts=['entities.py', 'cases_deaths.py', 'storage.py', os.path.join(os.pardir, 'utils', 'entity_types.py')],
+          inputs=[],
+          optional_inputs=[os.path.join('Datasets', 'countries.csv'),
+                           os.path.join('Datasets', 'Disease Spread', 'cases.csv'),
+                           os.path.join('Datasets', 'Daily Analysis', 'daily_analysis_data.csv'),
+                           os.path.join('Datasets', 'Daily Analysis', 'active_cases_and_estimated_recovery_data.csv'),
+                           os.path.join('Datasets', 'Daily Analysis', 'daily_vaccinations_and_icu_all_countries_data.csv'),
+                           os.path.join('Datasets', 'Vaccination', 'final.csv'),
+                           os.path.join('Datasets', 'Testing', 'Testing_Impact_Analysis.csv'),
+                           os.path.join('Datasets', 'Mobility Analysis', 'cleaned_data.parquet')],
+          outputs=[os.path.join('Datasets', 'Entities', 'entities.csv')]),
+]
+
+def file_digest(path, state):
+    """
+    sha256 of a file's content. Digests are remembered per (size, mtime) in the state file
+    so unchanged inputs are not re-read on every run.
+    """
+    stat = os.stat(path)
+    cached = state['files'].get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    state['files'][path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return digest.hexdigest()
+
+def expand_inputs(stage):
+    paths = []
+    for pattern in stage.inputs:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+def optional_input_states(stage, state):
+    """(path, digest) of every optional input, with None for the ones that are missing."""
+    paths = [path for pattern in stage.optional_inputs for path in sorted(glob.glob(pattern)) or [pattern]]
+    return [(path, file_digest(path, state) if os.path.exists(path) else None) for path in paths]
+
+def stage_outputs(stage, output_format):
+    return [path for output in stage.outputs for path in storage.output_paths(output, output_format)]
+
+def fingerprint(stage, state, output_format):
+    """Combined hash of the stage's scripts, output format and input files, or None if an input is missing."""
+    digest = hashlib.sha256(output_format.encode())
+    for path in [os.path.join(SCRIPTS_DIR, script) for script in stage.scripts] + expand_inputs(stage):
+        if not os.path.exists(path):
+            return None
+        digest.update(path.encode())
+        digest.update(file_digest(path, state).encode())
+    for path, path_digest in optional_input_states(stage, state):
+        digest.update(path.encode())
+        digest.update((path_digest or 'missing').encode())
+    return digest.hexdigest()
+
+def dependencies(stages, optional=False):
+    """Maps each stage name to the names of the stages that produce its inputs (or its optional inputs)."""
+    producers = {os.path.normpath(output): stage.name for stage in stages for output in stage.outputs}
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = set()
+        for pattern in (stage.optional_inputs if optional else stage.inputs):
+            for output, producer in producers.items():
+                if producer != stage.name and fnmatch.fnmatch(output, os.path.normpath(pattern)):
+                    deps[stage.name].add(producer)
+    return deps
+
+def load_state():
+    if os.path.exists(STATE_FILE_PATH):
+        with open(STATE_FILE_PATH) as f:
+            return json.load(f)
+    return {'files': {}, 'stages': {}}
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE_PATH), exist_ok=True)
+    with open(STATE_FILE_PATH, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def run_script(script, output_format, incremental=False):
+    """Runs one stage script as __main__ inside a worker process and returns its wall time."""
+    start = time.perf_counter()
+    os.chdir(PROJECT_DIR)
+    script_path = os.path.join(SCRIPTS_DIR, script)
+    sys.path.insert(0, SCRIPTS_DIR)
+    sys.argv = [script_path, '--format', output_format] + (['--incremental'] if incremental else [])
+    runpy.run_path(script_path, run_name='__main__')
+    return time.perf_counter() - start
+
+def run(selected=None, force=False, dry_run=False, workers=None, output_format='csv', incremental=False):
+    os.chdir(PROJECT_DIR)
+    stages = {stage.name: stage for stage in STAGES if not selected or stage.name in selected}
+    deps = {name: needs & set(stages) for name, needs in dependencies(list(stages.values())).items()}
+    optional_deps = {name: needs & set(stages) for name, needs in dependencies(list(stages.values()), optional=True).items()}
+    state = load_state()
+
+    pending = dict(stages)
+    running = {}
+    finished, failed = set(), set()
+    report = []
+
+    def ready(name):
+        # A stage waits for the producers of its optional inputs, but runs even if they failed
+        return deps[name] <= finished and optional_deps[name] <= finished | failed
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name in [name for name in pending if deps[name] & failed]:
+                report.append((name, 'blocked', 0.0))
+                failed.add(name)
+                del pending[name]
+
+            for name in [name for name in pending if ready(name)]:
+                stage = pending.pop(name)
+                stage_fingerprint = fingerprint(stage, state, output_format)
+                if stage_fingerprint is None:
+                    missing = [path for path in expand_inputs(stage) if not os.path.exists(path)]
+                    print(f"[{name}] missing inputs: {missing}")
+                    report.append((name, 'missing inputs', 0.0))
+                    failed.add(name)
+                    continue
+                up_to_date = (state['stages'].get(name) == stage_fingerprint
+                              and all(os.path.exists(output) for output in stage_outputs(stage, output_format)))
+                if up_to_date and not force:
+                    report.append((name, 'up to date', 0.0))
+                    finished.add(name)
+                elif dry_run:
+                    report.append((name, 'would run', 0.0))
+                    finished.add(name)
+                else:
+                    print(f"[{name}] running {stage.scripts[0]}")
+                    future = pool.submit(run_script, stage.scripts[0], output_format, incremental and stage.incremental)
+                    running[future] = (name, stage_fingerprint)
+
+            if not running:
+                if pending and not any(deps[name] & failed or ready(name) for name in pending):
+                    # Nothing can start and nothing is running: the remaining stages form a cycle
+                    for name in pending:
+                        report.append((name, 'dependency cycle', 0.0))
+                    failed.update(pending)
+                    pending.clear()
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, stage_fingerprint = running.pop(future)
+                try:
+                    seconds = future.result()
+                except BaseException as e:
+                    print(f"[{name}] failed: {e!r}")
+                    report.append((name, 'failed', 0.0))
+                    failed.add(name)
+                    continue
+                # Outputs were rewritten: drop their cached digests so downstream stages rehash them
+                for output in stage_outputs(stages[name], 'both'):
+                    state['files'].pop(output, None)
+                state['stages'][name] = stage_fingerprint
+                save_state(state)
+                report.append((name, 'ran', seconds))
+                finished.add(name)
+
+    print("-" * 60)
+    for name, status, seconds in report:
+        print(f"{name:<20} {status:<18} {f'{seconds:.1f}s' if status == 'ran' else ''}")
+    if not dry_run:
+        save_state(state)
+    return not failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Runs the Data Processing stages whose inputs have changed.')
+    parser.add_argument('stages', nargs='*', help='only run these stages (default: all)')
+    parser.add_argument('--force', action='store_true', help='run stages even if their inputs are unchanged')
+    parser.add_argument('--dry-run', action='store_true', help='only report which stages would run')
+    parser.add_argument('--workers', type=int, default=None, help='size of the process pool (default: CPU count)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='let stages that support it append only the dates added since their last run')
+    storage.add_format_argument(parser)
+    args = parser.parse_args()
+
+    unknown = set(args.stages) - {stage.name for stage in STAGES}
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    sys.exit(0 if run(args.stages, args.force, args.dry_run, args.workers, args.format, args.incremental) else 1)
@@ -1,27 +1,29 @@
 import pandas as pd
+import argparse
 import os
 
+import incremental
+import storage
+
 # File paths
 spread_path = os.path.join("Datasets", "spread.csv")
 output_path = os.path.join("Datasets", "active_cases_and_estimated_recovery_data.csv")
 
-def compute_recovery_estimates():
-    print("📥 Loading spread.csv and calculating active and recovery metrics...")
+# Rows of history the recovery estimate looks back over; an incremental run reads this
+# many rows of every country before its watermark
+LAG_ROWS = 14
 
-    # Load dataset
-    df = pd.read_csv(spread_path)
+DATASET = "recovery"
 
-    # Convert date column to datetime
-    df["date"] = pd.to_datetime(df["date"])
-
-    # Sort by country and date
-    df = df.sort_values(by=["country", "date"])
+def derive_recovery_estimates(df):
+    """Active cases and estimated recoveries from a spread.csv frame sorted by country and date."""
+    df = df.copy()
 
     # Calculate active cases (approx.)
     df["active_cases"] = df["total_cases"] - df["total_deaths"]
 
     # Calculate total_cases_14_days_ago (lagged)
-    df["total_cases_14_days_ago"] = df.groupby("country")["total_cases"].shift(14)
+    df["total_cases_14_days_ago"] = df.groupby("country")["total_cases"].shift(LAG_ROWS)
 
     # Estimate recovered
     df["estimated_recovered"] = (
@@ -36,15 +38,51 @@ def compute_recovery_estimates():
     # Drop rows where lag data doesn't exist
     df = df.dropna(subset=["total_cases_14_days_ago"])
 
-    # Save final selected columns
-    final_df = df[[
+    # Final selected columns
+    return df[[
         "country", "date", "total_cases", "total_deaths",
         "active_cases", "estimated_recovered", "estimated_recovery_rate"
     ]]
 
-    os.makedirs("Datasets", exist_ok=True)
-    final_df.to_csv(output_path, index=False)
-    print(f"Processed file saved to: {output_path}")
+def save_recovery_estimates(final_df, output_format, watermark, latest):
+    """Writes the estimates, or appends their rows after the watermark, and moves the watermark."""
+    if watermark is not None:
+        final_df = final_df[incremental.is_new(final_df, watermark)]
+        storage.append_table(final_df, output_path, output_format, date_columns=["date"], category_columns=["country"])
+        print(f"Appended {len(final_df)} new rows")
+    else:
+        storage.write_table(final_df, output_path, output_format, date_columns=["date"], category_columns=["country"])
+    print(f"Processed file saved to: {', '.join(storage.output_paths(output_path, output_format))}")
+    incremental.save_watermark(DATASET, latest, watermark)
+
+def compute_recovery_estimates(output_format="csv", incremental_run=False):
+    print("📥 Loading spread.csv and calculating active and recovery metrics...")
+
+    # Load dataset
+    df = pd.read_csv(spread_path)
+
+    # Convert date column to datetime
+    df["date"] = pd.to_datetime(df["date"])
+    latest = incremental.latest_dates(df)
+
+    watermark = None
+    if incremental_run:
+        watermark = incremental.resume_point(DATASET, storage.output_paths(output_path, output_format))
+        if watermark is None:
+            print("No previous run to continue from, rebuilding the full history")
+        elif not incremental.is_new(df, watermark).any():
+            print(f"Already up to date with {watermark.max().date()}")
+            return
+
+    # Sort by country and date
+    df = df.sort_values(by=["country", "date"])
+    if watermark is not None:
+        df = incremental.lookback_rows(df, watermark, LAG_ROWS)
+    save_recovery_estimates(derive_recovery_estimates(df), output_format, watermark, latest)
 
 if __name__ == "__main__":
-    compute_recovery_estimates()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Builds the active cases and estimated recovery data from spread.csv.")
+    storage.add_format_argument(parser)
+    incremental.add_incremental_argument(parser)
+    args = parser.parse_args()
+    compute_recovery_estimates(args.format, args.incremental)
\ No newline at end of file
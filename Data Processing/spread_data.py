@@ -0,0 +1,75 @@
+"""
+Builds the daily analysis data and the active cases / estimated recovery data in one pass.
+
+spread.csv is read, date-parsed and sorted by country and date once, and both derivations
+run on that in-memory frame, instead of daily_analysis_data.py and recovery_data.py each
+doing the same work. Pass --timing to print how long every step took.
+"""
+import argparse
+import time
+import pandas as pd
+
+import daily_analysis_data
+import incremental
+import recovery_data
+import storage
+
+INPUT_PATH = daily_analysis_data.INPUT_PATH
+
+# (dataset, outputs, look-back rows, derive, save) for every output built from spread.csv
+DERIVATIONS = [
+    (daily_analysis_data.DATASET, daily_analysis_data.OUTPUT_PATH, daily_analysis_data.LOOKBACK_ROWS,
+     daily_analysis_data.derive_daily_analysis, daily_analysis_data.save_daily_analysis),
+    (recovery_data.DATASET, recovery_data.output_path, recovery_data.LAG_ROWS,
+     recovery_data.derive_recovery_estimates, recovery_data.save_recovery_estimates),
+]
+
+def main(output_format="csv", incremental_run=False, timing=False):
+    timings = []
+    start = time.perf_counter()
+
+    print("📥 Loading spread.csv ...")
+    df = pd.read_csv(INPUT_PATH)
+    df["date"] = pd.to_datetime(df["date"])
+    latest = incremental.latest_dates(df)
+    timings.append(("read spread.csv", time.perf_counter() - start))
+
+    watermarks = {}
+    for dataset, output, _, _, _ in DERIVATIONS:
+        watermark = None
+        if incremental_run:
+            watermark = incremental.resume_point(dataset, storage.output_paths(output, output_format))
+            if watermark is None:
+                print(f"[{dataset}] no previous run to continue from, rebuilding the full history")
+        watermarks[dataset] = watermark
+
+    pending = [d for d in DERIVATIONS if watermarks[d[0]] is None or incremental.is_new(df, watermarks[d[0]]).any()]
+    if not pending:
+        print(f"✅ Already up to date with {df['date'].max().date()}")
+        return
+
+    step = time.perf_counter()
+    df = df.sort_values(by=["country", "date"])
+    timings.append(("sort by country, date", time.perf_counter() - step))
+
+    for dataset, _, lookback_rows, derive, save in pending:
+        step = time.perf_counter()
+        watermark = watermarks[dataset]
+        # Filtering a sorted frame keeps it sorted, so the window needs no second sort
+        window = df if watermark is None else incremental.lookback_rows(df, watermark, lookback_rows)
+        save(derive(window), output_format, watermark, latest)
+        timings.append((f"derive and write {dataset}", time.perf_counter() - step))
+
+    timings.append(("total", time.perf_counter() - start))
+    if timing:
+        print("-" * 45)
+        for step_name, seconds in timings:
+            print(f"{step_name:<35} {seconds:>8.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds daily_analysis_data.csv and the recovery data from one read of spread.csv.")
+    storage.add_format_argument(parser)
+    incremental.add_incremental_argument(parser)
+    parser.add_argument("--timing", action="store_true", help="print the time spent in every step")
+    args = parser.parse_args()
+    main(args.format, args.incremental, args.timing)
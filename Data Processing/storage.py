@@ -0,0 +1,72 @@
+import os
+import numpy as np
+import pandas as pd
+
+OUTPUT_FORMATS = ['csv', 'parquet', 'both']
+
+def add_format_argument(parser):
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help='write the outputs as CSV (default), typed Parquet, or both')
+
+def parquet_path(csv_path):
+    """The Parquet copy of an output lives next to the CSV with the same name."""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def output_paths(csv_path, output_format):
+    paths = []
+    if output_format in ('csv', 'both'):
+        paths.append(csv_path)
+    if output_format in ('parquet', 'both'):
+        paths.append(parquet_path(csv_path))
+    return paths
+
+def typed(df, date_columns=(), category_columns=()):
+    """
+    Applies the Parquet schema: categorical key columns, datetime64 dates and float32 metrics.
+    Integer and remaining string columns are left as they are.
+    """
+    df = df.copy()
+    for col in date_columns:
+        df[col] = pd.to_datetime(df[col])
+    for col in category_columns:
+        df[col] = df[col].astype('category')
+    float_columns = df.select_dtypes(include='floating').columns
+    df[float_columns] = df[float_columns].astype(np.float32)
+    return df
+
+def write_table(df, csv_path, output_format='csv', date_columns=(), category_columns=(), **csv_kwargs):
+    """
+    Writes df to csv_path and/or its Parquet sibling. When only the CSV is written, an older
+    Parquet copy is removed so the pages, which prefer Parquet, never read stale data.
+    """
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    if output_format in ('csv', 'both'):
+        df.to_csv(csv_path, index=False, **csv_kwargs)
+    if output_format in ('parquet', 'both'):
+        typed(df, date_columns, category_columns).to_parquet(parquet_path(csv_path), index=False)
+    elif os.path.exists(parquet_path(csv_path)):
+        os.remove(parquet_path(csv_path))
+
+def append_table(df, csv_path, output_format='csv', date_columns=(), category_columns=(), sort_by=('country', 'date'),
+                 **csv_kwargs):
+    """
+    Appends df to the outputs written earlier by write_table(), which the incremental scripts
+    write sorted by sort_by. The CSV is extended in place, so its rows are in the order they
+    were written: each country's rows stay in date order (a run only appends the dates after
+    that country's watermark), but a country's new rows follow the other countries' older
+    ones. Parquet files cannot be appended to, so the Parquet copy is read back, re-sorted by
+    sort_by and rewritten, and stays row for row equal to a full rebuild.
+    """
+    if output_format in ('csv', 'both'):
+        existing_columns = list(pd.read_csv(csv_path, nrows=0).columns)
+        if existing_columns != list(df.columns):
+            raise ValueError(f"Cannot append to {csv_path}: columns {list(df.columns)} do not match {existing_columns}")
+        df.to_csv(csv_path, mode='a', header=False, index=False, **csv_kwargs)
+    if output_format in ('parquet', 'both'):
+        existing = pd.read_parquet(parquet_path(csv_path))
+        combined = pd.concat([existing, typed(df, date_columns, category_columns)], ignore_index=True)
+        combined = typed(combined, date_columns, category_columns)
+        combined = combined.sort_values(list(sort_by), kind='stable', ignore_index=True)
+        combined.to_parquet(parquet_path(csv_path), index=False)
+    elif os.path.exists(parquet_path(csv_path)):
+        os.remove(parquet_path(csv_path))
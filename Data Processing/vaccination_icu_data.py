@@ -1,26 +1,26 @@
 import pandas as pd
+import argparse
 import os
 
+import ingest
+import storage
+
 # Set file paths
 vax_path = os.path.join("Datasets", "vaccinations_global.csv")
 hosp_path = os.path.join("Datasets", "hospital.csv")
 output_path = os.path.join("Datasets","Daily Analysis", "daily_vaccinations_and_icu_all_countries_data.csv")
 
-def clean_and_merge_data():
+def clean_and_merge_data(output_format="csv", memory_limit_mb=ingest.DEFAULT_MEMORY_LIMIT_MB):
     print("📥 Loading vaccination and ICU data...")
 
-    # Load datasets
-    vax = pd.read_csv(vax_path)
-    hosp = pd.read_csv(hosp_path)
-
-    # ✅ Select necessary columns
-    vax = vax[[
+    # ✅ Load only the necessary columns
+    vax = ingest.read_filtered(vax_path, columns=[
         "country", "date", "daily_vaccinations",
         "people_vaccinated", "people_fully_vaccinated", "people_unvaccinated"
-    ]].copy()
-    hosp = hosp[[
+    ], memory_limit_mb=memory_limit_mb)
+    hosp = ingest.read_filtered(hosp_path, columns=[
         "country", "date", "daily_occupancy_icu"
-    ]].copy()
+    ], memory_limit_mb=memory_limit_mb)
 
     # ✅ Convert date columns to datetime
     vax["date"] = pd.to_datetime(vax["date"])
@@ -38,10 +38,13 @@ def clean_and_merge_data():
     cleaned = merged[merged["daily_vaccinations"].notna()].copy()
 
     # ✅ Save cleaned data
-    os.makedirs("Datasets", exist_ok=True)
-    cleaned.to_csv(output_path, index=False)
-    print(f"✅ Cleaned data saved to: {output_path}")
+    storage.write_table(cleaned, output_path, output_format, date_columns=["date"], category_columns=["country"])
+    print(f"✅ Cleaned data saved to: {', '.join(storage.output_paths(output_path, output_format))}")
 
 # ✅ Fix entry point name check
 if __name__ == "__main__":
-    clean_and_merge_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Builds the daily vaccinations and ICU occupancy data.")
+    storage.add_format_argument(parser)
+    ingest.add_memory_argument(parser)
+    args = parser.parse_args()
+    clean_and_merge_data(args.format, args.memory_limit)
\ No newline at end of file
@@ -4,12 +4,22 @@ import plotly.express as px
 import os
 import numpy as np
 
+from utils import animation
+from utils.asof import AsOfIndex
+from utils.downsample import downsampled_chart
+from utils.entities import entities_of_type
+from utils.render import plotly_chart
+from utils.sections import is_open, lazy_tabs
+from utils.tables import read_table, is_current, table_mtime
+
 DEATHS_FILE_PATH = os.path.join('Datasets','Disease Spread','deaths.csv')
 CASES_FILE_PATH = os.path.join('Datasets','Disease Spread','cases.csv')
+DEATHS_MONTHLY_FILE_PATH = os.path.join('Datasets','Disease Spread','deaths_monthly.csv')
+CASES_MONTHLY_FILE_PATH = os.path.join('Datasets','Disease Spread','cases_monthly.csv')
 
 ############# Loading CSV file and Caching them #####################################
 def load_spread_df(path):
-    spread_df = pd.read_csv(path)
+    spread_df = read_table(path)
     column_names = spread_df.columns.to_list()
     column_names = [i.replace("_"," ").title() for i in column_names]
     spread_df.columns = column_names
@@ -19,16 +29,46 @@ def load_choropleth_df(df):
     choropleth_df = df.dropna()
     choropleth_df['Date'] = pd.to_datetime(choropleth_df['Date'])
     choropleth_df['year_month'] = choropleth_df['Date'].dt.to_period('M')
-    choropleth_df = choropleth_df.groupby(['Country', 'year_month']).last().reset_index()
+    choropleth_df = choropleth_df.groupby(['Country', 'year_month'], observed=True).last().reset_index()
     choropleth_df.drop('year_month', axis=1, inplace=True)
     choropleth_df['Date'] = choropleth_df['Date'].dt.date
     return choropleth_df
 
+def load_choropleth_snapshot(snapshot_path, source_path, spread_df, columns):
+    # Month-end snapshots are precomputed by Data Processing/monthly_snapshots.py; only
+    # aggregate the daily data here when that table is missing or older than its source
+    if is_current(snapshot_path, source_path):
+        choropleth_df = load_spread_df(snapshot_path)
+        choropleth_df['Date'] = pd.to_datetime(choropleth_df['Date']).dt.date
+        return choropleth_df
+    return load_choropleth_df(spread_df[columns].copy())
+
+# One read-only copy of the page's datasets is shared by every session of the server process,
+# so memory does not grow with the number of viewers; session_state only holds widget values.
+# The file versions are part of the cache key, so rebuilt datasets replace the cached copy.
+@st.cache_resource(max_entries=1, show_spinner='Loading the cases and deaths datasets...')
+def load_datasets(cases_version, deaths_version):
+    cases_df = load_spread_df(CASES_FILE_PATH)
+    deaths_df = load_spread_df(DEATHS_FILE_PATH)
+    return {
+        'cases_df': cases_df,
+        'deaths_df': deaths_df,
+        # Every country's latest row, for the overview charts
+        'latest_cases_df': AsOfIndex(cases_df, 'Country', 'Date').last(),
+        'latest_deaths_df': AsOfIndex(deaths_df, 'Country', 'Date').last(),
+        'choropleth_cases_df': load_choropleth_snapshot(
+            CASES_MONTHLY_FILE_PATH, CASES_FILE_PATH, cases_df,
+            ['Date','Country','Total Cases','Total Cases Per Million','Isocode','Continent']),
+        'choropleth_deaths_df': load_choropleth_snapshot(
+            DEATHS_MONTHLY_FILE_PATH, DEATHS_FILE_PATH, deaths_df,
+            ['Date','Country','Total Deaths','Total Deaths Per Million','Isocode','Continent']),
+    }
+
 ################## Overview ###################################
 @st.fragment
 def continents_charts(cases_df, deaths_df):
     st.subheader("COVID-19 Impact by Continents")
-    continents = ['Asia','Europe','North America', 'South America', 'Africa', 'Oceania']
+    continents = entities_of_type('continent')
 
     # cases_df = cases_df.dropna(subset=['Continent'])
     cases_df = cases_df[cases_df['Country'].isin(continents)].reset_index(drop=True)
@@ -67,7 +107,7 @@ def continents_charts(cases_df, deaths_df):
                         title=title,
                         labels={'Country': 'Continent'},
                     )
-        st.plotly_chart(fig)
+        plotly_chart(fig)
     with col2:
         title = "COVID-19 Deaths by Continent"
         if st.session_state.overview_continents_graph_type == 'Pie Chart':
@@ -83,7 +123,7 @@ def continents_charts(cases_df, deaths_df):
                         title=title,
                         labels={'Country': 'Continent'},
                     )
-        st.plotly_chart(fig)
+        plotly_chart(fig)
 
 @st.fragment
 def top_n_countries(cases_df, deaths_df):
@@ -143,7 +183,7 @@ def top_n_countries(cases_df, deaths_df):
                         y=values, 
                         title=title,
                     )
-        st.plotly_chart(fig)
+        plotly_chart(fig)
     with col2:
         title = "COVID-19 Deaths by Country"
         if st.session_state.overview_contries_graph_type == 'Pie Chart':
@@ -160,9 +200,9 @@ def top_n_countries(cases_df, deaths_df):
                         y=values, 
                         title=title,
                     )
-        st.plotly_chart(fig)
+        plotly_chart(fig)
 
-def overview(cases_df, deaths_df):
+def overview(latest_cases_df, latest_deaths_df):
     # st.subheader('Overview')
     total_cases = 773956770 
     total_deaths = 7016159
@@ -174,10 +214,8 @@ def overview(cases_df, deaths_df):
     col2.metric(label="Total COVID-19 Deaths", value=f"{total_deaths:,}")
     col3.metric(label="Case Fatality Rate", value= f"{case_fatality_rate:.6f}%")
     
-    continents_charts(cases_df.groupby('Country').tail(1).reset_index(drop=True),
-                     deaths_df.groupby('Country').tail(1).reset_index(drop=True))
-    top_n_countries(cases_df.groupby('Country').tail(1).reset_index(drop=True),
-                     deaths_df.groupby('Country').tail(1).reset_index(drop=True))
+    continents_charts(latest_cases_df, latest_deaths_df)
+    top_n_countries(latest_cases_df, latest_deaths_df)
 
 
 ############ Choropleth Animation #############################
@@ -219,13 +257,18 @@ def choropleth_animation(cases_df, deaths_df):
     else:
         temp_df = dataframe[dataframe['Continent'] == st.session_state.map_scope]
         range_color = [0,temp_df[parameter].quantile(0.95)]
+    # Month-end snapshots, coarsened to quarters if the animation would exceed its frame budget
+    dataframe, resolution = animation.budgeted_frames(dataframe, 'Date', 'Country', value_columns=[parameter],
+                                                      plotted_columns=['Isocode', parameter, 'Country'],
+                                                      resolutions=['monthly', 'quarterly'])
     fig = px.choropleth(
                 data_frame= dataframe,
                 locations='Isocode',
                 color = parameter,
                 hover_name='Country',
                 color_continuous_scale='Greens',
-                animation_frame='Date',
+                animation_frame='frame',
+                labels={'frame': 'Date'},
                 title=f'{parameter} Over Time For {st.session_state.map_scope.title()}',
                 range_color=range_color,
                 scope=st.session_state.map_scope.lower(),
@@ -237,7 +280,8 @@ def choropleth_animation(cases_df, deaths_df):
         height = 500,
         margin=dict(l=0, r=0, t=50, b=0) 
     )
-    st.plotly_chart(fig,use_container_width=False)
+    plotly_chart(fig,use_container_width=False)
+    st.caption(animation.resolution_caption(dataframe, resolution))
 
 ########################### Graphs ###############################
 @st.fragment
@@ -246,7 +290,7 @@ def time_series_continents(cases_df, deaths_df):
     st.subheader("Timeseries Analysis-Continent Wise")
     st.multiselect(
             "Select the continents",
-            ['World','Asia','Europe','North America', 'South America', 'Africa', 'Oceania'],
+            entities_of_type('world') + entities_of_type('continent'),
             default=['World','Asia','Europe'],
             key = 'time_series_continents',
         )
@@ -304,12 +348,12 @@ def time_series_continents(cases_df, deaths_df):
                 log_y= use_log)
     
     fig.update_layout(xaxis_title = "Date", yaxis_title = parameter, hovermode='x unified')
-    st.plotly_chart(fig)
+    plotly_chart(fig)
 
 @st.fragment
 def time_series_countries(cases_df, deaths_df):
     st.subheader("Timeseries Analysis-Country Wise")
-    continents = ['Asia','Europe','North America', 'South America', 'Africa', 'Oceania']
+    continents = entities_of_type('continent')
     countries = [country for country in cases_df['Country'].unique() if country not in continents]
 
     st.multiselect(
@@ -372,7 +416,7 @@ def time_series_countries(cases_df, deaths_df):
                 log_y= use_log)
     
     fig.update_layout(xaxis_title = "Date", yaxis_title = parameter, hovermode='x unified')
-    st.plotly_chart(fig)
+    downsampled_chart(fig, 'time_series_countries')
 
 def plot_graph(cases_df, deaths_df):
     time_series_continents(cases_df,deaths_df)
@@ -395,7 +439,7 @@ def plot_graph(cases_df, deaths_df):
                    y="Country",
                    color='Continent'
                    )
-    st.plotly_chart(fig)
+    plotly_chart(fig)
 
     st.subheader("Timeline of Countries Reaching 1 Case Per Million Population Threshold")
     fig = px.strip(cases_1_per_million_df,
@@ -403,7 +447,7 @@ def plot_graph(cases_df, deaths_df):
                 y="Country",
                 color='Continent'
                 )
-    st.plotly_chart(fig)
+    plotly_chart(fig)
 
     st.subheader("Timeline of Countries Reaching 5 Deaths Threshold")
     fig = px.strip(deaths_5_df,
@@ -411,7 +455,7 @@ def plot_graph(cases_df, deaths_df):
                 y="Country",
                 color='Continent'
                 )
-    st.plotly_chart(fig)
+    plotly_chart(fig)
 
     st.subheader("Timeline of Countries Reaching 0.1 Deaths Per Million Population Threshold")
     fig = px.strip(deaths_0_1_per_million_df,
@@ -419,7 +463,7 @@ def plot_graph(cases_df, deaths_df):
                 y="Country",
                 color='Continent'
                 )
-    st.plotly_chart(fig)
+    plotly_chart(fig)
 
 
 ######################### Main Code ###################### 
@@ -428,29 +472,18 @@ title = "Analysis of Disease Spread"
 st.set_page_config(page_title = title,layout='wide')
 st.title(title)
 
-if 'cases_df' not in st.session_state:
-    st.session_state.cases_df = load_spread_df(CASES_FILE_PATH)
-
-if 'deaths_df' not in st.session_state:
-    st.session_state.deaths_df = load_spread_df(DEATHS_FILE_PATH)
-
-if'choropleth_cases_df' not in st.session_state:
-    cases_df_temp = st.session_state.cases_df.copy()
-    cases_df_temp = cases_df_temp[['Date','Country','Total Cases','Total Cases Per Million','Isocode','Continent']]
-    st.session_state.choropleth_cases_df = load_choropleth_df(cases_df_temp)
-
-if'choropleth_deaths_df' not in st.session_state:
-    deaths_df_temp = st.session_state.deaths_df.copy()
-    deaths_df_temp = deaths_df_temp[['Date','Country','Total Deaths','Total Deaths Per Million','Isocode','Continent']]
-    st.session_state.choropleth_deaths_df = load_choropleth_df(deaths_df_temp)
+datasets = load_datasets(table_mtime(CASES_FILE_PATH), table_mtime(DEATHS_FILE_PATH))
 
-tabs = st.tabs(['Overview', 'Map Visualization','Timeline Plots'])
+tabs = lazy_tabs(['Overview', 'Map Visualization','Timeline Plots'], key='spread_tab')
 
 with tabs[0]:
-    overview(st.session_state.cases_df, st.session_state.deaths_df)
-    pass
+    if is_open(tabs[0]):
+        overview(datasets['latest_cases_df'], datasets['latest_deaths_df'])
+        pass
 with tabs[1]:
-    choropleth_animation(st.session_state.choropleth_cases_df, st.session_state.choropleth_deaths_df)
+    if is_open(tabs[1]):
+        choropleth_animation(datasets['choropleth_cases_df'], datasets['choropleth_deaths_df'])
 with tabs[2]:    
-    plot_graph(st.session_state.cases_df, st.session_state.deaths_df)
-    pass
+    if is_open(tabs[2]):
+        plot_graph(datasets['cases_df'], datasets['deaths_df'])
+        pass
\ No newline at end of file
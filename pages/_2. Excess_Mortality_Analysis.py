@@ -7,26 +7,54 @@ from functools import reduce
 import sys
 import os
 from scipy.signal import savgol_filter
+
+from utils.asof import AsOfIndex
+from utils.figure_cache import cached_figure, dataset_version, show_stats
+from utils.render import plotly_chart
+from utils.sections import is_open, lazy_tabs
+from utils.tables import read_table
 # sys.path.append(str(Path(__file__).parent.parent.parent))
 
 st.set_page_config(page_title="Excess Mortality Analysis", page_icon="📊", layout="centered")
 
+NATIONAL_FILE_PATH = os.path.join('Datasets', 'Mortality_Analysis', 'national_data.csv')
+GLOBAL_MEAN_FILE_PATH = os.path.join('Datasets', 'Mortality_Analysis', 'global_mean_data.csv')
+
+# Every cached loader takes the version of its dataset, so a rebuilt file is read again
+@st.cache_data
+def load_national_data(version):
+      return read_table(NATIONAL_FILE_PATH, parse_dates=['Date'])
+
+@st.cache_data
+def load_global_mean_data(version):
+      return read_table(GLOBAL_MEAN_FILE_PATH, parse_dates=['Date'])
+
+# Every country's row on the latest date, for the top/bottom charts and the maps
 @st.cache_data
-def load_data():
-      national_df = pd.read_csv(os.path.join('Datasets', 'Mortality_Analysis', 'national_data.csv'), parse_dates=['Date'])
-      global_mean_df = pd.read_csv(os.path.join('Datasets', 'Mortality_Analysis', 'global_mean_data.csv'), parse_dates=['Date'])
-      return national_df, global_mean_df
+def load_latest_national(version):
+      national_df = load_national_data(version)
+      return AsOfIndex(national_df, 'Country', 'Date').on(national_df['Date'].max())
 
 def savgol_filtering(df, window, poly):
       df = df.copy()
-      for col in df.columns[1:]:
-            if col != 'Date':
-                  df[col] = savgol_filter(df[col], window, poly, mode='nearest')
+      columns = [col for col in df.columns[1:] if col != 'Date']
+      # All columns in one call, filtering along the rows
+      df[columns] = savgol_filter(df[columns].to_numpy(), window, poly, axis=0, mode='nearest')
       return df
 
+# Smoothed global series between two dates (None for no bound), kept per window and polyorder
+@st.cache_data(max_entries=64)
+def smoothed_global_mean(version, window, poly, start=None, end=None):
+      global_mean_df = load_global_mean_data(version)
+      in_range = pd.Series(True, index=global_mean_df.index)
+      if start is not None:
+            in_range &= global_mean_df['Date'] >= pd.to_datetime(start)
+      if end is not None:
+            in_range &= global_mean_df['Date'] <= pd.to_datetime(end)
+      return savgol_filtering(global_mean_df[in_range], window, poly)
+
 def plot_figure(df, list_y, yaxis_title, x='Date', xaxis_title='Date', type='line'):
       if type == 'line':
-            df = savgol_filtering(df, 64, 2)
             subfig = px.line(df.melt(id_vars=x, value_vars=list_y, var_name='Variable', value_name='Value'), x='Date', y='Value', color='Variable', labels={'Value': yaxis_title, 'Date': 'Date'}, height=500)
             subfig.update_layout(xaxis_title=xaxis_title, yaxis_title=yaxis_title)
       if type == 'bar':
@@ -54,15 +82,19 @@ def create_subplots(df, lol_y, list_ytitles, list_x, list_xtitles, num_rows=1, n
       fig.update_layout(height=num_rows*500)
       if title:
             fig.update_layout(title = title)
-      return st.plotly_chart(fig, use_container_width=True)
+      return fig
 
 def create_map(df, col, title=None):
       fig = px.choropleth(df, locations='Country', locationmode='country names', color=col, hover_name='Country', color_continuous_scale=px.colors.sequential.Plasma, title=title, labels={col: col})
       fig.update_geos(showcoastlines=True, coastlinecolor="Black", showland=True, landcolor="LightGray", showlakes=True, lakecolor="LightBlue")
       fig.update_coloraxes(colorbar_title=None)
-      return st.plotly_chart(fig, use_container_width=True)
+      return fig
 
-national_df, global_mean_df = load_data()
+global_version = dataset_version(GLOBAL_MEAN_FILE_PATH)
+national_version = dataset_version(NATIONAL_FILE_PATH)
+national_df = load_national_data(national_version)
+global_mean_df = load_global_mean_data(global_version)
+latest_national_df = load_latest_national(national_version)
 countries = national_df['Country'].unique()
 features = national_df.columns[2:]
 
@@ -91,47 +123,70 @@ st.write("Excess Mortality serves as a more reliable metric to assess the impact
 st.header("Excess Mortality Trends")
 st.write("")
 
+# Smoothing of the trend lines; changing it only rebuilds the trend charts
+with st.expander("Smoothing (Savitzky-Golay filter)"):
+      col1, col2 = st.columns(2)
+      with col1:
+            window = st.slider("Window length (data points)", min_value=7, max_value=121, value=64)
+      with col2:
+            poly = st.slider("Polynomial order", min_value=1, max_value=5, value=2)
+smoothing = (window, poly)
+
 with st.container():
-      tab1, tab2, tab3, tab4, tab5 = st.tabs(["Reported and Excess Deaths", "Excess to Reported Deaths", "Reported CFR and Estimated CFR", "Excess Deaths Top & Bottom Nations", "Map Overlays"])
+      tab1, tab2, tab3, tab4, tab5 = lazy_tabs(["Reported and Excess Deaths", "Excess to Reported Deaths", "Reported CFR and Estimated CFR", "Excess Deaths Top & Bottom Nations", "Map Overlays"], key='excess_mortality_tab')
 
       with tab1:
-            st.subheader("Reported and Excess Deaths & Cumulative Reported and Excess Deaths")
-            st.write("")
-            st.write('The following graphs compare the daily and cumulative deaths reported by the resprective countries over time to the estimated daily and cumulative excess deaths.')
-
-            create_subplots(global_mean_df, lol_y=[['New Deaths per Million', 'Estimated Daily Excess Deaths per Million'], ['Total Deaths per Million', 'Cumulative Estimated Daily Excess Deaths per Million']],
-                list_ytitles=['Deaths and Excess Mortality', 'Deaths and Excess Mortality'],
-                list_x=['Date', 'Date'], list_xtitles=['Date', 'Date'],
-                num_rows=1, num_cols=2, lx=0.5, ly=1.165, type='line')
+            if is_open(tab1):
+                  st.subheader("Reported and Excess Deaths & Cumulative Reported and Excess Deaths")
+                  st.write("")
+                  st.write('The following graphs compare the daily and cumulative deaths reported by the resprective countries over time to the estimated daily and cumulative excess deaths.')
+
+                  plotly_chart(cached_figure('excess_deaths_trends', global_version, smoothing, lambda: create_subplots(
+                      smoothed_global_mean(global_version, window, poly), lol_y=[['New Deaths per Million', 'Estimated Daily Excess Deaths per Million'], ['Total Deaths per Million', 'Cumulative Estimated Daily Excess Deaths per Million']],
+                      list_ytitles=['Deaths and Excess Mortality', 'Deaths and Excess Mortality'],
+                      list_x=['Date', 'Date'], list_xtitles=['Date', 'Date'],
+                      num_rows=1, num_cols=2, lx=0.5, ly=1.165, type='line')), use_container_width=True)
       with tab2:
-            st.subheader("Excess Death to Reported Deaths")
-            st.write("")
-            st.write("The following graph plots the ratio of cumulative excess deaths to the reported number of deaths over time.")
-            create_subplots(global_mean_df[global_mean_df['Date']>=pd.to_datetime('2020-04-10')], lol_y = [['Cumulative Excess Deaths to Case Deaths']],
-                        list_ytitles=['Cumulative Excess Deaths to Case Deaths'], list_x=['Date'], list_xtitles=['Date'],
-                        num_rows=1, num_cols=1, lx=0.5, ly=1.165, type='line')         
+            if is_open(tab2):
+                  st.subheader("Excess Death to Reported Deaths")
+                  st.write("")
+                  st.write("The following graph plots the ratio of cumulative excess deaths to the reported number of deaths over time.")
+                  plotly_chart(cached_figure('excess_to_reported_trend', global_version, smoothing, lambda: create_subplots(
+                              smoothed_global_mean(global_version, window, poly, start='2020-04-10'), lol_y = [['Cumulative Excess Deaths to Case Deaths']],
+                              list_ytitles=['Cumulative Excess Deaths to Case Deaths'], list_x=['Date'], list_xtitles=['Date'],
+                              num_rows=1, num_cols=1, lx=0.5, ly=1.165, type='line')), use_container_width=True)         
       with tab3:
-            st.subheader("Reported Case Fatality Rate and Estimated Case Fatality Rate")
-            st.write("")
-            st.write("The following graphs compare the estimated fatality rate to the fatality rate according to government-reported data")
-            create_subplots(global_mean_df[(global_mean_df['Date']>=pd.to_datetime('2020-06-01'))& (global_mean_df['Date']<=pd.to_datetime('2023-10-01'))], lol_y=[['CFR', 'Estimated Daily CFR'], ['CFR', 'Estimated Cumulative CFR']],
-                        list_ytitles=['CFR and Estimated Daily CFR', 'CFR and Estimated Cumulative CFR'], list_x=['Date', 'Date'], list_xtitles=['Date', 'Date'],
-                              num_rows=1, num_cols=2, lx=0.21, ly=1.165, type='line')
+            if is_open(tab3):
+                  st.subheader("Reported Case Fatality Rate and Estimated Case Fatality Rate")
+                  st.write("")
+                  st.write("The following graphs compare the estimated fatality rate to the fatality rate according to government-reported data")
+                  plotly_chart(cached_figure('excess_cfr_trends', global_version, smoothing, lambda: create_subplots(
+                              smoothed_global_mean(global_version, window, poly, start='2020-06-01', end='2023-10-01'), lol_y=[['CFR', 'Estimated Daily CFR'], ['CFR', 'Estimated Cumulative CFR']],
+                              list_ytitles=['CFR and Estimated Daily CFR', 'CFR and Estimated Cumulative CFR'], list_x=['Date', 'Date'], list_xtitles=['Date', 'Date'],
+                                    num_rows=1, num_cols=2, lx=0.21, ly=1.165, type='line')), use_container_width=True)
       with tab4:
-            st.subheader("Countrywise Top and Bottom Countries by Cumulaitve Excess Deaths per Million")
-            st.write("")
-            st.write("Below graph shows 20 countries with the most cumulative excess deaths per million as on 01-01-2024 and their respective reported total deaths.")
-            create_subplots(national_df[national_df['Date']==national_df['Date'].max()].sort_values(by='Cumulative Estimated Daily Excess Deaths per Million', ascending=False).head(20),
-                        lol_y=[['Cumulative Estimated Daily Excess Deaths per Million', 'Total Deaths per Million']],list_ytitles=['Cumulative Excess and Case Deaths per Million'], list_x = ['Country'], list_xtitles=['Country'],
-                        num_rows=1, num_cols=1, lx=0.3, ly=1.165, type='bar')
-            st.write("Below graph shows 20 countries with the least cumulative excess deaths per million as on 01-01-2024 and their respective reported total deaths.")
-            create_subplots(national_df[national_df['Date']==national_df['Date'].max()].sort_values(by='Cumulative Estimated Daily Excess Deaths per Million', ascending=True).head(20),
+            if is_open(tab4):
+                  st.subheader("Countrywise Top and Bottom Countries by Cumulaitve Excess Deaths per Million")
+                  st.write("")
+                  st.write("Below graph shows 20 countries with the most cumulative excess deaths per million as on 01-01-2024 and their respective reported total deaths.")
+                  plotly_chart(cached_figure('excess_top_countries', national_version, (), lambda: create_subplots(
+                              latest_national_df.sort_values(by='Cumulative Estimated Daily Excess Deaths per Million', ascending=False).head(20),
                               lol_y=[['Cumulative Estimated Daily Excess Deaths per Million', 'Total Deaths per Million']],list_ytitles=['Cumulative Excess and Case Deaths per Million'], list_x = ['Country'], list_xtitles=['Country'],
-                              num_rows=1, num_cols=1, lx=0.3, ly=1.165, type='bar')
+                              num_rows=1, num_cols=1, lx=0.3, ly=1.165, type='bar')), use_container_width=True)
+                  st.write("Below graph shows 20 countries with the least cumulative excess deaths per million as on 01-01-2024 and their respective reported total deaths.")
+                  plotly_chart(cached_figure('excess_bottom_countries', national_version, (), lambda: create_subplots(
+                                    latest_national_df.sort_values(by='Cumulative Estimated Daily Excess Deaths per Million', ascending=True).head(20),
+                                    lol_y=[['Cumulative Estimated Daily Excess Deaths per Million', 'Total Deaths per Million']],list_ytitles=['Cumulative Excess and Case Deaths per Million'], list_x = ['Country'], list_xtitles=['Country'],
+                                    num_rows=1, num_cols=1, lx=0.3, ly=1.165, type='bar')), use_container_width=True)
       with tab5:
-            st.subheader("Map Overlays")
-            st.write("")
-            st.write("Below map show the cumulative excess deaths per million as on 01-01-2024.")
-            create_map(national_df[national_df['Date']==national_df['Date'].max()], col='Cumulative Estimated Daily Excess Deaths per Million', title='Cumulative Estimated Daily Excess Deaths per Million')
-            st.write("Below map show the total reported case deaths per million as on 01-01-2024.")
-            create_map(national_df[national_df['Date']==national_df['Date'].max()], col='Total Deaths per Million', title='Total Deaths per Million')
+            if is_open(tab5):
+                  st.subheader("Map Overlays")
+                  st.write("")
+                  st.write("Below map show the cumulative excess deaths per million as on 01-01-2024.")
+                  plotly_chart(cached_figure('excess_deaths_map', national_version, (), lambda: create_map(
+                        latest_national_df, col='Cumulative Estimated Daily Excess Deaths per Million', title='Cumulative Estimated Daily Excess Deaths per Million')), use_container_width=True)
+                  st.write("Below map show the total reported case deaths per million as on 01-01-2024.")
+                  plotly_chart(cached_figure('reported_deaths_map', national_version, (), lambda: create_map(
+                        latest_national_df, col='Total Deaths per Million', title='Total Deaths per Million')), use_container_width=True)
+
+show_stats()
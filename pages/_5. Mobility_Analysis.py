@@ -4,98 +4,63 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import pyarrow.parquet as pq
 from scipy.signal import savgol_filter
 
+from utils.entities import countries_only
+from utils.fragments import show_fragment_log, timed_fragment
+from utils.render import plotly_chart
+from utils.sections import is_open, lazy_tabs
+from utils.tables import read_parquet_slice
+from utils.windows import WindowAggregator
+
 # ---------- Load Cleaned Data ----------
 data_path = os.path.join("Datasets", "Mobility Analysis", "cleaned_data.parquet")
-merged_df = pd.read_parquet(data_path)
-merged_df["month"] = merged_df["date"].dt.to_period("M").astype(str)
-merged_df["year"] = merged_df["date"].dt.year
+policy_cols = [
+    "c1m_school_closing", "c2m_workplace_closing",
+    "c6m_stay_at_home_requirements", "c7m_restrictions_on_internal_movement"
+]
 
+# Only the columns, dates and countries a chart needs are read; the filters are applied while scanning the file
+@st.cache_data(max_entries=32)
+def load_mobility(columns, start_date, end_date, countries=None, version=None):
+    return read_parquet_slice(data_path, list(columns), start=start_date, end=end_date, keys=countries)
 
-st.title("Mobility Analysis")
-# ---------- Sidebar ----------
-st.sidebar.title("Filters")
-min_date = merged_df["date"].min()
-max_date = merged_df["date"].max()
-date_range = st.sidebar.date_input(
-    "Select Date Range",
-    [min_date, max_date],
-    min_value=min_date,
-    max_value=max_date
-)
-# Filter merged_df based on selected date range
-merged_df = merged_df[
-    (merged_df["date"] >= pd.to_datetime(date_range[0])) &
-    (merged_df["date"] <= pd.to_datetime(date_range[1]))
-]
+def period_columns():
+    """The year (e.g. 2021) and month (yyyymm) keys stored by Data Processing/mobility_data.py, if the file has them."""
+    file_columns = pq.read_schema(data_path).names
+    return {period: period for period in ("year", "month") if period in file_columns}
 
-# ---------- Tabs ----------
-global_tab, top_tab, single_tab, multi_tab,  = st.tabs(["🌍 Global Overview", "🌟 Top Countries", "🏳️ Single Country", "🌐 Multi-Country"])
+# Cumulative sums and counts of mobility and cases over the whole file, per country and across
+# all rows, so the averages and totals of any date range are lookups instead of groupbys
+@st.cache_resource
+def load_windows(version=None):
+    periods = period_columns()
+    df = read_parquet_slice(data_path, ["country", "date", "trend", "new_cases", *periods], notnull=["date"])
+    return WindowAggregator(df, ["trend", "new_cases"], period_columns=periods)
 
-# ---------- Global Overview ----------
-with global_tab:
-    st.info("Note: Google Mobility data was discontinued after October 15, 2022. Values may appear flat beyond this point due to no new updates.")
-    st.subheader("1. Line Chart – Global Average Mobility Index Over Time")
-    st.write("This line chart shows how the average global mobility index changed over time, reflecting the impact of global COVID-19 waves and policy changes on human movement.")
-    global_avg_mobility = merged_df.groupby("date")["trend"].mean().reset_index()
-    fig_line = go.Figure()
-    fig_line.add_trace(go.Scatter(x=global_avg_mobility["date"], y=global_avg_mobility["trend"],
-                                  mode="lines", name="Mobility Index"))
-    fig_line.update_layout(
-        xaxis_title="Date",
-        yaxis_title="Average Mobility Index (%)",
-        xaxis=dict(
-            rangeselector=dict(
-                buttons=list([
-                    dict(count=1, label="1M", step="month", stepmode="backward"),
-                    dict(count=3, label="3M", step="month", stepmode="backward"),
-                    dict(count=6, label="6M", step="month", stepmode="backward"),
-                    dict(count=1, label="1Y", step="year", stepmode="backward"),
-                    dict(step="all", label="All")
-                ])
-            ),
-            rangeslider=dict(visible=True),
-            type="date"
-        )
-    )
-    st.plotly_chart(fig_line, use_container_width=True)
+# The same over the rows with mobility and every policy recorded, for the treemap
+@st.cache_resource
+def load_policy_windows(version=None):
+    df = read_parquet_slice(data_path, ["country", "date", "trend", *policy_cols],
+                            notnull=["country", "trend", *policy_cols])
+    return WindowAggregator(df, ["trend", *policy_cols])
 
-    st.subheader("2. Bar Chart – Year-wise Global Average Mobility Index Comparison")
-    st.write("This bar chart compares average global mobility by year, helping us observe year-over-year shifts due to lockdowns, reopenings, and vaccination rollouts.")
-    yearly_avg_mobility = merged_df.groupby("year")["trend"].mean().reset_index()
-    fig_bar = px.bar(
-        yearly_avg_mobility,
-        x="year",
-        y="trend",
-        text_auto=True,
-        labels={"trend": "Mobility Index (%)", "year": "Year"}
-    )
-    st.plotly_chart(fig_bar, use_container_width=True)
-
-    st.subheader("3. Treemap – Mobility under Combined Government Policies")
-    st.write("This treemap visualizes countries based on average mobility and combined policy stringency, highlighting how stronger restrictions typically correlate with reduced mobility.")
-    # Define relevant columns
-    policy_cols = [
-        "c1m_school_closing", "c2m_workplace_closing",
-        "c6m_stay_at_home_requirements", "c7m_restrictions_on_internal_movement"
-    ]
-    # Filter valid data
-    treemap_data = merged_df.dropna(subset=["country", "trend"] + policy_cols)
-    # Group and calculate policy strength
-    treemap_grouped = treemap_data.groupby("country").agg({
-        "trend": "mean",
-        "c1m_school_closing": "mean",
-        "c2m_workplace_closing": "mean",
-        "c6m_stay_at_home_requirements": "mean",
-        "c7m_restrictions_on_internal_movement": "mean"
-    }).reset_index()
-    treemap_grouped["policy_score"] = (
-        treemap_grouped["c1m_school_closing"] +
-        treemap_grouped["c2m_workplace_closing"] +
-        treemap_grouped["c6m_stay_at_home_requirements"] +
-        treemap_grouped["c7m_restrictions_on_internal_movement"]
-    )
+@st.cache_data
+def load_date_bounds(version=None):
+    dates = read_parquet_slice(data_path, ["date"])["date"]
+    return dates.min(), dates.max()
+
+def countries_in_range(start_date, end_date):
+    return load_windows(data_version).per_key("trend", start_date, end_date, how="count").index.tolist()
+
+def month_labels(months):
+    """yyyymm month keys as "YYYY-MM" labels."""
+    return (months // 100).astype(str) + "-" + (months % 100).astype(str).str.zfill(2)
+
+# Treemap of mobility and policy strength, rerun on its own when the score range changes
+@timed_fragment
+def treemap_chart(treemap_grouped):
     # --- Zoom-In Slider ---
     min_score = int(treemap_grouped["policy_score"].min())
     max_score = int(treemap_grouped["policy_score"].max())
@@ -120,11 +85,11 @@ with global_tab:
             "policy_score": "Policy Strength Score"
         }
     )
-    st.plotly_chart(fig_treemap, use_container_width=True)
-
+    plotly_chart(fig_treemap, use_container_width=True)
 
-# ---------- Top Countries ----------
-with top_tab:
+# Pareto and funnel charts of the top countries, rerun on their own when N changes
+@timed_fragment
+def top_countries_charts(country_level_df):
     # Selector inside the tab
     top_n = st.selectbox(
         "Select number of top countries to display",
@@ -134,13 +99,8 @@ with top_tab:
 
     st.subheader(f"1. Pareto Chart – Mobility in Top {top_n} Countries by COVID-19 Cases")
     st.write("This dual-axis Pareto chart highlights countries with the highest number of COVID-19 cases and compares their mobility patterns to observe possible correlations between mobility and infection spread.")
-    # Filter out aggregates like continents
-    country_level_df = merged_df[~merged_df["country"].str.contains("World|Asia|Africa|Europe|America|Oceania", case=False)]
-    # Group and prepare data
-    pareto_data = country_level_df.groupby("country", as_index=False).agg({
-        "new_cases": "sum",
-        "trend": "mean"
-    }).rename(columns={"trend": "mobility_index"})
+    # Prepare data
+    pareto_data = country_level_df.rename(columns={"trend": "mobility_index"})
     pareto_data = pareto_data.dropna(subset=["new_cases", "mobility_index"])
     pareto_data["mobility_index"] = pareto_data["mobility_index"].round(2)
     # Sort and select top N
@@ -182,12 +142,12 @@ with top_tab:
         legend=dict(orientation="h", y=1.1, x=0.5, xanchor="center"),
         margin=dict(t=50, b=50)
     )
-    st.plotly_chart(fig_pareto, use_container_width=True)
+    plotly_chart(fig_pareto, use_container_width=True)
 
     st.subheader(f"2. Funnel Chart – Top {top_n} Countries Ranked by Mobility Index")
     st.write("This funnel chart ranks countries purely based on their average mobility index, revealing which populations had the most movement freedom regardless of their case counts.")
-    # Group and prepare mobility data
-    mobility_data = country_level_df.groupby("country", as_index=False)["trend"].mean()
+    # Prepare mobility data
+    mobility_data = country_level_df[["country", "trend"]]
     mobility_data = mobility_data.dropna()
     mobility_data = mobility_data[mobility_data["trend"] > 0]
     mobility_data = mobility_data.sort_values(by="trend", ascending=False).head(top_n)
@@ -199,19 +159,17 @@ with top_tab:
         y="country",
         labels={"trend": "Mobility Index (%)", "country": "Country"},
     )
-    st.plotly_chart(fig_funnel, use_container_width=True)
+    plotly_chart(fig_funnel, use_container_width=True)
 
-# ---------- Single Country ---------- with smoothing filter
-with single_tab:
-    st.info("Note: Google Mobility data was discontinued after October 15, 2022. Values may appear flat beyond this point due to no new updates.")
-    
-    countries_available = merged_df["country"].dropna().unique()
+# Mobility and cases of one country, rerun on its own when the country or the smoothing changes
+@timed_fragment
+def single_country_chart(countries_available, start_date, end_date, version):
     selected_country = st.selectbox(
         "Select a Country",
-        options=sorted(countries_available),
-        index=list(sorted(countries_available)).index("United States") if "United States" in countries_available else 0
+        options=countries_available,
+        index=countries_available.index("United States") if "United States" in countries_available else 0
     )
-    country_df = merged_df[merged_df["country"] == selected_country].copy()
+    country_df = load_mobility(("date", "trend", "new_cases"), start_date, end_date, (selected_country,), version)
 
     # Set index to date
     country_df = country_df.set_index("date")
@@ -267,74 +225,179 @@ with single_tab:
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
         margin=dict(t=50, b=50)
     )
-    st.plotly_chart(fig_single_country, use_container_width=True)
+    plotly_chart(fig_single_country, use_container_width=True)
 
-# ---------- Multi-Country ----------
-with multi_tab:
-    st.info("Note: Google Mobility data was discontinued after October 15, 2022. Values may appear flat beyond this point due to no new updates.")
-    countries_available = merged_df["country"].dropna().unique()
-    multi_countries = st.multiselect(
-        "Select Countries to Compare",
-        options=sorted(countries_available),
-        default=["United States", "India", "Brazil"]
+# Average mobility of the compared countries in one year, rerun on its own when the year changes
+@timed_fragment
+def annual_mobility_chart(windows, multi_countries, years, start_date, end_date):
+    selected_year = st.selectbox("Select Year", years, index=years.index(2021) if 2021 in years else 0)
+    # Average over the part of the selected year within the date range
+    year_start = max(start_date, pd.Timestamp(int(selected_year), 1, 1))
+    year_end = min(end_date, pd.Timestamp(int(selected_year), 12, 31))
+    year_mobility = windows.per_key("trend", year_start, year_end, how="mean")
+    avg_mobility = (
+        year_mobility[year_mobility.index.isin(multi_countries)]
+        .rename("avg_mobility")
+        .rename_axis("country")
+        .reset_index()
     )
-    if multi_countries:
-        # Extract unique years for filtering
-        merged_df["year"] = merged_df["date"].dt.year
-        years = sorted(merged_df["year"].dropna().unique())
-        # Filter data for selected countries
-        filtered = merged_df[merged_df["country"].isin(multi_countries)]
-        
-        st.subheader("1. Line Chart – Yearly Mobility Trend")
-        st.write("This multi-country line chart compares mobility trends across years, revealing how movement patterns evolved across different stages of the pandemic.")
-        # Resample or aggregate monthly if needed
-        filtered["month"] = filtered["date"].dt.to_period("M").astype(str)
-        # Group by month and country to get average monthly mobility
-        monthly_trend = (
-            filtered.groupby(["month", "country"], as_index=False)["trend"]
-            .mean()
-            .rename(columns={"trend": "Mobility Index (%)"})
-        )
-        fig = px.line(
-            monthly_trend,
-            x="month",
-            y="Mobility Index (%)",
-            color="country",
-            markers=True,
-            labels={"month": "Year", "country": "Country"}
-        )
-        fig.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.subheader("2. Bar Chart – Average Annual Mobility Comparison")
-        st.write("This bar chart compares the selected countries' average mobility in a specific year, revealing how different regions responded to the pandemic in terms of movement restrictions.")
-        selected_year = st.selectbox("Select Year", years, index=years.index(2021) if 2021 in years else 0)
-        # Filter further by selected year
-        filtered_year = filtered[filtered["year"] == selected_year]
-        avg_mobility = (
-            filtered_year.groupby("country", as_index=False)["trend"]
-            .mean()
-            .rename(columns={"trend": "avg_mobility"})
+    avg_mobility["avg_mobility"] = avg_mobility["avg_mobility"].round(2)
+    avg_mobility = avg_mobility.sort_values(by="avg_mobility", ascending=False)
+    fig_bar = px.bar(
+        avg_mobility,
+        x="country",
+        y="avg_mobility",
+        text="avg_mobility",
+        labels={"avg_mobility": "Mobility Index (%)", "country": "Country"},
+        title=f"Average Mobility Index in {selected_year} by Country",
+        color="country",
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+    fig_bar.update_traces(textposition="auto")
+    fig_bar.update_layout(
+        xaxis_title="Country",
+        yaxis_title="Mobility Index (%)",
+        xaxis_tickangle=-45,
+        showlegend=False
+    )
+    plotly_chart(fig_bar, use_container_width=True)
+
+data_version = os.path.getmtime(data_path)
+
+
+st.title("Mobility Analysis")
+# ---------- Sidebar ----------
+st.sidebar.title("Filters")
+min_date, max_date = load_date_bounds(data_version)
+date_range = st.sidebar.date_input(
+    "Select Date Range",
+    [min_date, max_date],
+    min_value=min_date,
+    max_value=max_date
+)
+start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
+windows = load_windows(data_version)
+
+# ---------- Tabs ----------
+global_tab, top_tab, single_tab, multi_tab,  = lazy_tabs(["🌍 Global Overview", "🌟 Top Countries", "🏳️ Single Country", "🌐 Multi-Country"], key="mobility_tab")
+
+# ---------- Global Overview ----------
+with global_tab:
+    if is_open(global_tab):
+        st.info("Note: Google Mobility data was discontinued after October 15, 2022. Values may appear flat beyond this point due to no new updates.")
+        st.subheader("1. Line Chart – Global Average Mobility Index Over Time")
+        st.write("This line chart shows how the average global mobility index changed over time, reflecting the impact of global COVID-19 waves and policy changes on human movement.")
+        global_avg_mobility = windows.daily("trend", start_date, end_date, how="mean").reset_index()
+        fig_line = go.Figure()
+        fig_line.add_trace(go.Scatter(x=global_avg_mobility["date"], y=global_avg_mobility["trend"],
+                                      mode="lines", name="Mobility Index"))
+        fig_line.update_layout(
+            xaxis_title="Date",
+            yaxis_title="Average Mobility Index (%)",
+            xaxis=dict(
+                rangeselector=dict(
+                    buttons=list([
+                        dict(count=1, label="1M", step="month", stepmode="backward"),
+                        dict(count=3, label="3M", step="month", stepmode="backward"),
+                        dict(count=6, label="6M", step="month", stepmode="backward"),
+                        dict(count=1, label="1Y", step="year", stepmode="backward"),
+                        dict(step="all", label="All")
+                    ])
+                ),
+                rangeslider=dict(visible=True),
+                type="date"
+            )
         )
-        avg_mobility["avg_mobility"] = avg_mobility["avg_mobility"].round(2)
-        avg_mobility = avg_mobility.sort_values(by="avg_mobility", ascending=False)
+        plotly_chart(fig_line, use_container_width=True)
+
+        st.subheader("2. Bar Chart – Year-wise Global Average Mobility Index Comparison")
+        st.write("This bar chart compares average global mobility by year, helping us observe year-over-year shifts due to lockdowns, reopenings, and vaccination rollouts.")
+        yearly_avg_mobility = windows.by_period("trend", "year", start_date, end_date).reset_index()
         fig_bar = px.bar(
-            avg_mobility,
-            x="country",
-            y="avg_mobility",
-            text="avg_mobility",
-            labels={"avg_mobility": "Mobility Index (%)", "country": "Country"},
-            title=f"Average Mobility Index in {selected_year} by Country",
-            color="country",
-            color_discrete_sequence=px.colors.qualitative.Set2
+            yearly_avg_mobility,
+            x="year",
+            y="trend",
+            text_auto=True,
+            labels={"trend": "Mobility Index (%)", "year": "Year"}
         )
-        fig_bar.update_traces(textposition="auto")
-        fig_bar.update_layout(
-            xaxis_title="Country",
-            yaxis_title="Mobility Index (%)",
-            xaxis_tickangle=-45,
-            showlegend=False
+        plotly_chart(fig_bar, use_container_width=True)
+
+        st.subheader("3. Treemap – Mobility under Combined Government Policies")
+        st.write("This treemap visualizes countries based on average mobility and combined policy stringency, highlighting how stronger restrictions typically correlate with reduced mobility.")
+        # Average mobility and policies per country over the rows with all of them recorded
+        policy_windows = load_policy_windows(data_version)
+        treemap_grouped = pd.DataFrame({
+            col: policy_windows.per_key(col, start_date, end_date, how="mean")
+            for col in ["trend", *policy_cols]
+        }).rename_axis("country").reset_index()
+        # Calculate policy strength
+        treemap_grouped["policy_score"] = (
+            treemap_grouped["c1m_school_closing"] +
+            treemap_grouped["c2m_workplace_closing"] +
+            treemap_grouped["c6m_stay_at_home_requirements"] +
+            treemap_grouped["c7m_restrictions_on_internal_movement"]
         )
-        st.plotly_chart(fig_bar, use_container_width=True)
-    else:
-        st.warning("Please select multiple countries from the sidebar.")
+        treemap_chart(treemap_grouped)
+
+
+# ---------- Top Countries ----------
+with top_tab:
+    if is_open(top_tab):
+        # Total cases and average mobility per country, leaving out aggregates like continents
+        country_level_df = countries_only(pd.DataFrame({
+            "new_cases": windows.per_key("new_cases", start_date, end_date),
+            "trend": windows.per_key("trend", start_date, end_date, how="mean")
+        }).rename_axis("country").reset_index())
+        top_countries_charts(country_level_df)
+
+# ---------- Single Country ---------- with smoothing filter
+with single_tab:
+    if is_open(single_tab):
+        st.info("Note: Google Mobility data was discontinued after October 15, 2022. Values may appear flat beyond this point due to no new updates.")
+    
+        countries_available = countries_in_range(start_date, end_date)
+        single_country_chart(countries_available, start_date, end_date, data_version)
+
+# ---------- Multi-Country ----------
+with multi_tab:
+    if is_open(multi_tab):
+        st.info("Note: Google Mobility data was discontinued after October 15, 2022. Values may appear flat beyond this point due to no new updates.")
+        countries_available = countries_in_range(start_date, end_date)
+        multi_countries = st.multiselect(
+            "Select Countries to Compare",
+            options=countries_available,
+            default=["United States", "India", "Brazil"]
+        )
+        if multi_countries:
+            # Years in the selected date range, for filtering
+            years = windows.by_period("trend", "year", start_date, end_date).index.tolist()
+        
+            st.subheader("1. Line Chart – Yearly Mobility Trend")
+            st.write("This multi-country line chart compares mobility trends across years, revealing how movement patterns evolved across different stages of the pandemic.")
+            # Average monthly mobility of every selected country
+            monthly_trend = (
+                pd.concat([windows.by_period("trend", "month", start_date, end_date, key=country).to_frame().assign(country=country)
+                           for country in multi_countries])
+                .reset_index()
+                .sort_values(["month", "country"], ignore_index=True)
+                .rename(columns={"trend": "Mobility Index (%)"})
+            )[["month", "country", "Mobility Index (%)"]]
+            monthly_trend["month"] = month_labels(monthly_trend["month"])
+            fig = px.line(
+                monthly_trend,
+                x="month",
+                y="Mobility Index (%)",
+                color="country",
+                markers=True,
+                labels={"month": "Year", "country": "Country"}
+            )
+            fig.update_layout(xaxis_tickangle=-45)
+            plotly_chart(fig, use_container_width=True)
+
+            st.subheader("2. Bar Chart – Average Annual Mobility Comparison")
+            st.write("This bar chart compares the selected countries' average mobility in a specific year, revealing how different regions responded to the pandemic in terms of movement restrictions.")
+            annual_mobility_chart(windows, multi_countries, years, start_date, end_date)
+        else:
+            st.warning("Please select multiple countries from the sidebar.")
+
+show_fragment_log()
@@ -3,6 +3,13 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import os
+
+from utils.figure_cache import cached_figure, dataset_version, show_stats
+from utils.fragments import show_fragment_log, timed_fragment
+from utils.hierarchy import age_groups, build_hierarchy
+from utils.render import plotly_chart
+from utils.sections import is_open, lazy_tabs
+from utils.tables import read_table
 # ------------------- Page Config -------------------
 st.set_page_config(
     page_title="India COVID-19 Dashboard",
@@ -11,55 +18,72 @@ st.set_page_config(
 )
 
 # ------------------- Data Loading Functions -------------------
+COVID_FILE_PATH = os.path.join("Datasets", "Impacts_in_India", "statewise_daily_totals.csv")
+POPULATION_FILE_PATH = os.path.join("Datasets", "Impacts_in_India", "population_india_census2011.csv")
+
+# Every cached loader takes the version of its datasets, so a rebuilt file is read again
 @st.cache_data
-def load_covid_data():
-    file_path = os.path.join("Datasets", "Impacts_in_India", "statewise_daily_totals.csv")
-    return pd.read_csv(file_path, parse_dates=['Date'], dayfirst=True)
+def load_covid_data(version):
+    return read_table(COVID_FILE_PATH, parse_dates=['Date'], dayfirst=True)
 
 @st.cache_data
-def load_population_data():
-    file_path = os.path.join("Datasets", "Impacts_in_India", "population_india_census2011.csv")
-    pop = pd.read_csv(file_path)
+def load_population_data(version):
+    pop = read_table(POPULATION_FILE_PATH)
     pop['Density'] = pop['Density'].str.extract(r'(\d+)').astype(float)
     return pop
 
+DISTRICT_FILE_PATH = os.path.join("Datasets", "Impacts_in_India", "cleaned_data.csv")
+CENTROIDS_FILE_PATH = os.path.join("Datasets", "Impacts_in_India", "district wise centroids.csv")
+AGE_FILE_PATH = os.path.join("Datasets", "Impacts_in_India", "agegender_cleaneddata.csv")
+
 @st.cache_data
-def load_district_data():
-    data_path = os.path.join("Datasets", "Impacts_in_India", "cleaned_data.csv")
-    centroid_path = os.path.join("Datasets", "Impacts_in_India", "district wise centroids.csv")
-    df = pd.read_csv(data_path, parse_dates=["Date"])
-    centroids = pd.read_csv(centroid_path)
+def load_district_data(version):
+    df = read_table(DISTRICT_FILE_PATH, parse_dates=["Date"])
+    centroids = read_table(CENTROIDS_FILE_PATH)
     return df, centroids
 
+# Zone of every district in May 2021, with its hover text
+@st.cache_data
+def load_district_zones(version):
+    df, centroids = load_district_data(version)
+
+    # Filter data for May 2021
+    df_may = df[(df['Date'].dt.month == 5) & (df['Date'].dt.year == 2021)]
+
+    # Get max values for each district
+    district_max = df_may.groupby("District")[['Confirmed', 'Recovered', 'Deceased']].max().reset_index()
+    dist_merged = pd.merge(district_max, centroids, on="District")
+
+    # Classify the districts based on the number of confirmed cases
+    dist_merged['Classification'] = dist_merged['Confirmed'].apply(
+        lambda c: 'Red' if c >= 20000 else 'Orange' if c >= 5000 else 'Green'
+    )
+
+    # Concatenate Confirmed, Recovered, and Deceased for hover info
+    dist_merged['hover_data'] = (
+        "<b>" + dist_merged['District'] + "</b><br>" +  # Bold the district name
+        "Classification: " + dist_merged['Classification'] + "<br>" +
+        "Latitude: " + dist_merged['Latitude'].astype(str) + "<br>" +
+        "Longitude: " + dist_merged['Longitude'].astype(str) + "<br>" +
+        "Confirmed: " + dist_merged['Confirmed'].astype(str) + "<br>" +
+        "Recovered: " + dist_merged['Recovered'].astype(str) + "<br>" +
+        "Deceased: " + dist_merged['Deceased'].astype(str)
+    )
+    return dist_merged
+
 @st.cache_data 
-def load_age_data():
-    file_path = os.path.join("Datasets", "Impacts_in_India", "agegender_cleaneddata.csv")
-    df = pd.read_csv(file_path)
+def load_age_data(version):
+    df = read_table(AGE_FILE_PATH)
     df = df.dropna(subset=["age", "gender", "current_status"])
     df["age"] = pd.to_numeric(df["age"], errors="coerce")
     df = df.dropna(subset=["age"])
-    df["age_group"] = df["age"].apply(lambda x: "< 40" if x < 40 else "40 - 60" if x <= 60 else "> 60")
+    df["age_group"] = age_groups(df["age"])
     return df
 
 
-# ------------------- Main App -------------------
-st.title("📊 India COVID-19 Comprehensive Dashboard")
-st.markdown("### A comprehensive view of COVID-19 statistics across India")
-
-tab1, tab2, tab3, tab4 = st.tabs([
-    "📈 Overall & Statewise",
-    "🧑👥🧑 Population Analysis",
-    "🗺️ District Classification", 
-    "👫 Age/Gender Analysis"
-])
-
-# ------------------- Tab 1: Original app1 + app2 + app3 -------------------
-with tab1:
-    # ---------- From app1.py ----------
-    st.title("🫧 COVID-19 Animated Bubble Chart (India - Statewise)")
-    st.markdown("An animated view of how different states fared over time.")
-
-    df = load_covid_data()
+# Animated bubble chart of the selected states, rerun on its own when the states or the axes change
+@timed_fragment
+def state_bubble_chart(df):
     states = sorted(df['State'].unique())
     default_states = ["Tamil Nadu", "Uttar Pradesh", "West Bengal", "Gujarat"]
     selected_states = st.multiselect("🎯 Filter States:", states, default=default_states)
@@ -68,185 +92,115 @@ with tab1:
     x_metric = st.selectbox("📅 Select X-axis Metric:", ["Date", "Confirmed", "Recovered", "Deceased"], index=0)
     y_metric = st.selectbox("📈 Select Y-axis Metric:", ["Confirmed", "Recovered", "Deceased"], index=1)
 
-    filtered_df = df[df['State'].isin(selected_states)]
-
-    # Ensure Date column is in datetime format
-    filtered_df['Date'] = pd.to_datetime(filtered_df['Date'])
-
-    # Calculate axis ranges
-    x_range = [filtered_df[x_metric].min(), filtered_df[x_metric].max()] if x_metric != "Date" else [filtered_df['Date'].min(), filtered_df['Date'].max()]
-    y_range = [0, filtered_df[y_metric].max() * 1.1]
-
-    # Create animated scatter plot
-    fig = px.scatter(
-        filtered_df,
-        x=x_metric,
-        y=y_metric,
-        animation_frame="Date",
-        animation_group="State",
-        size="Deceased",
-        color="State",
-        hover_name="State",
-        size_max=50,
-        range_x=x_range,
-        range_y=y_range,
-        title=f"COVID-19 Bubble Chart: {x_metric} vs {y_metric}"
-    )
-
-    # Keep animation speed same
-    fig.layout.updatemenus[0].buttons[0].args[1]['frame']['duration'] = 200 / 7
-
-    st.plotly_chart(fig, use_container_width=True)
-
-    
-    # ---------- From app2.py ----------
-    st.title("📊 India COVID-19 Daily Totals")
-    st.markdown("Stacked bar chart of daily total Confirmed, Recovered, and Deceased cases aggregated across all states.")
-
-    # Group data
-    daily = df.groupby("Date")[["Confirmed", "Recovered", "Deceased"]].sum().reset_index()
-
-    # Define more vibrant and visually appealing colors
-    colors = {"Confirmed": "#FF6F61",   # Soft coral red for Confirmed
-            "Recovered": "#4CAF50",   # Vibrant green for Recovered
-            "Deceased": "#FFEB3B"}   # Bright yellow for Deceased
-
-    # Create the figure
-    fig = go.Figure()
-
-    # Add bars for each category
-    fig.add_trace(go.Bar(
-        x=daily["Date"],
-        y=daily["Confirmed"],
-        name="Confirmed",
-        marker_color=colors["Confirmed"],
-        hovertemplate="Date: %{x|%Y-%m-%d}<br>Confirmed: %{y:,}<extra></extra>"
-    ))
-
-    fig.add_trace(go.Bar(
-        x=daily["Date"],
-        y=daily["Recovered"],
-        name="Recovered",
-        marker_color=colors["Recovered"],
-        hovertemplate="Date: %{x|%Y-%m-%d}<br>Recovered: %{y:,}<extra></extra>"
-    ))
-
-    fig.add_trace(go.Bar(
-        x=daily["Date"],
-        y=daily["Deceased"],
-        name="Deceased",
-        marker_color=colors["Deceased"],
-        hovertemplate="Date: %{x|%Y-%m-%d}<br>Deceased: %{y:,}<extra></extra>"
-    ))
-
-    # Styling the layout
-    fig.update_layout(
-        barmode="stack",  # Stacking the bars
-        title="📅 COVID-19 Daily Case Totals in India",
-        xaxis_title="Date",
-        yaxis_title="Number of Cases",
-        template="plotly",  # Light mode template
-        bargap=0.05,
-        # plot_bgcolor="white",  # Set background color to white
-        # paper_bgcolor="white",  # Set paper color to white
-        # font=dict(color="black"),  # Set font color to black for visibility
-        showlegend=True,
-        legend=dict(
-            title="Case Type",
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
+    def build_bubble_chart():
+        filtered_df = df[df['State'].isin(selected_states)]
+
+        # Ensure Date column is in datetime format
+        filtered_df['Date'] = pd.to_datetime(filtered_df['Date'])
+
+        # Calculate axis ranges
+        x_range = [filtered_df[x_metric].min(), filtered_df[x_metric].max()] if x_metric != "Date" else [filtered_df['Date'].min(), filtered_df['Date'].max()]
+        y_range = [0, filtered_df[y_metric].max() * 1.1]
+
+        # Create animated scatter plot
+        fig = px.scatter(
+            filtered_df,
+            x=x_metric,
+            y=y_metric,
+            animation_frame="Date",
+            animation_group="State",
+            size="Deceased",
+            color="State",
+            hover_name="State",
+            size_max=50,
+            range_x=x_range,
+            range_y=y_range,
+            title=f"COVID-19 Bubble Chart: {x_metric} vs {y_metric}"
         )
-    )
 
-    st.plotly_chart(fig, use_container_width=True)
+        # Keep animation speed same
+        fig.layout.updatemenus[0].buttons[0].args[1]['frame']['duration'] = 200 / 7
+        return fig
 
+    # The chart only changes with the dataset, the states and the axes
+    fig = cached_figure("state_bubble_chart", dataset_version(COVID_FILE_PATH), (sorted(selected_states), x_metric, y_metric),
+                        build_bubble_chart)
+    plotly_chart(fig, use_container_width=True)
 
-
-    # ---------- From app3.py ----------
-    st.title("🦠 COVID-19 Confirmed Cases - Animated Race Chart")
-
+# Animated race of the top or bottom N states, rerun on its own when the range changes
+@timed_fragment
+def state_race_chart(df):
     col1, col2 = st.columns(2)
     with col1:
         range_type = st.selectbox("📊 Select Range Type:", ["Top N States", "Bottom N States"])
     with col2:
         n = st.slider("Select N", 3, 20, 10)
 
-    df_cumulative = df.pivot(index="Date", columns="State", values="Confirmed").fillna(0)
-    selected_states = df_cumulative.iloc[-1].sort_values(
-        ascending=(range_type == "Bottom N States")
-    ).head(n).index.tolist()
-
-    df_long = df_cumulative[selected_states].reset_index().melt(
-        id_vars="Date", var_name="State", value_name="Confirmed"
-    )
+    def build_race_chart():
+        df_cumulative = df.pivot(index="Date", columns="State", values="Confirmed").fillna(0)
+        selected_states = df_cumulative.iloc[-1].sort_values(
+            ascending=(range_type == "Bottom N States")
+        ).head(n).index.tolist()
 
-    fig = px.bar(
-        df_long,
-        x="Confirmed",
-        y="State",
-        color="State",
-        animation_frame=df_long["Date"].dt.strftime("%Y-%m-%d"),
-        animation_group="State",
-        orientation="h",
-        range_x=[0, df_long["Confirmed"].max() * 1.2],
-        title="📊 COVID-19 Confirmed Cases in India (Animated)",
-        text="Confirmed"
-    )
-
-    fig.update_layout(
-        yaxis={"categoryorder": "total descending"},
-        updatemenus=[
-            {
-                "buttons": [
-                    {
-                        "args": [None, {
-                            "frame": {"duration": 50, "redraw": True},
-                            "transition": {"duration": 25},
-                            "fromcurrent": True
-                        }],
-                        "label": "Play",
-                        "method": "animate"
-                    },
-                    {
-                        "args": [None, {
-                            "frame": {"duration": 0, "redraw": False},
-                            "transition": {"duration": 0}
-                        }],
-                        "label": "Pause",
-                        "method": "animate"
-                    }
-                ],
-                "direction": "left",
-                "pad": {"r": 10, "t": 87},
-                "showactive": False,
-                "type": "buttons",
-                "x": 0.1,
-                "xanchor": "right",
-                "y": 0.1,
-                "yanchor": "top"
-            }
-        ]
-    )
+        df_long = df_cumulative[selected_states].reset_index().melt(
+            id_vars="Date", var_name="State", value_name="Confirmed"
+        )
 
-    st.plotly_chart(fig, use_container_width=True)
+        fig = px.bar(
+            df_long,
+            x="Confirmed",
+            y="State",
+            color="State",
+            animation_frame=df_long["Date"].dt.strftime("%Y-%m-%d"),
+            animation_group="State",
+            orientation="h",
+            range_x=[0, df_long["Confirmed"].max() * 1.2],
+            title="📊 COVID-19 Confirmed Cases in India (Animated)",
+            text="Confirmed"
+        )
 
+        fig.update_layout(
+            yaxis={"categoryorder": "total descending"},
+            updatemenus=[
+                {
+                    "buttons": [
+                        {
+                            "args": [None, {
+                                "frame": {"duration": 50, "redraw": True},
+                                "transition": {"duration": 25},
+                                "fromcurrent": True
+                            }],
+                            "label": "Play",
+                            "method": "animate"
+                        },
+                        {
+                            "args": [None, {
+                                "frame": {"duration": 0, "redraw": False},
+                                "transition": {"duration": 0}
+                            }],
+                            "label": "Pause",
+                            "method": "animate"
+                        }
+                    ],
+                    "direction": "left",
+                    "pad": {"r": 10, "t": 87},
+                    "showactive": False,
+                    "type": "buttons",
+                    "x": 0.1,
+                    "xanchor": "right",
+                    "y": 0.1,
+                    "yanchor": "top"
+                }
+            ]
+        )
+        return fig
 
+    fig = cached_figure("state_race_chart", dataset_version(COVID_FILE_PATH), (range_type, n), build_race_chart)
+    plotly_chart(fig, use_container_width=True)
 
-# --# ------------------- Tab 2: Original app4 + app6 with state selection -------------------
-with tab2:
-    # State selection (keep this section identical)
-    pop_data = load_population_data()
-    covid_latest = load_covid_data().groupby("State").last().reset_index()
-    merged = pd.merge(covid_latest, pop_data, on="State")
-    
-    all_states = merged['State'].unique().tolist()
-    mandatory = ["Maharashtra", "Kerala", "Uttar Pradesh"]
-    others = [s for s in all_states if s not in mandatory]
-    default = mandatory + pd.Series(others).sample(4).tolist()[:7]
-    
+# Population and density scatters of the selected states, rerun on their own when the states change
+@timed_fragment
+def population_charts(merged, all_states, default):
     selected_states = st.multiselect(
         "Select States:", 
         all_states,
@@ -257,128 +211,213 @@ with tab2:
 
     # Modified layout for side-by-side comparisons
     st.markdown('<div class="main-title">📊 COVID-19 Impact Analysis</div>', unsafe_allow_html=True)
-    
+
     metrics = [
         ('Confirmed', 'Plasma', 'Confirmed Cases'),
         ('Recovered', 'Viridis', 'Recovered Cases'), 
         ('Deceased', 'Reds', 'Deceased Cases')
     ]
-    
+
+    # The scatters only change with the datasets and the selected states
+    scatter_version = dataset_version(COVID_FILE_PATH, POPULATION_FILE_PATH)
+    scatter_states = sorted(selected_states)
+
+    def build_scatter(x, metric, color_scale, title):
+        return px.scatter(
+            filtered_df, x=x, y=metric, color=metric,
+            size='Population', log_x=True, hover_name='State',
+            color_continuous_scale=color_scale,
+            title=title
+        )
+
     for metric, color_scale, title in metrics:
         st.markdown(f'<div class="section-title">📈 {title}</div>', unsafe_allow_html=True)
         col1, col2 = st.columns(2)
-        
+
         with col1:
-            fig = px.scatter(
-                filtered_df, x='Population', y=metric, color=metric,
-                size='Population', log_x=True, hover_name='State',
-                color_continuous_scale=color_scale,
-                title=f'{title} vs Population'
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        
+            fig = cached_figure(f"population_scatter_{metric}", scatter_version, scatter_states,
+                                lambda: build_scatter('Population', metric, color_scale, f'{title} vs Population'))
+            plotly_chart(fig, use_container_width=True)
+
         with col2:
-            fig = px.scatter(
-                filtered_df, x='Density', y=metric, color=metric,
-                size='Population', log_x=True, hover_name='State',
-                color_continuous_scale=color_scale,
-                title=f'{title} vs Population Density'
-            )
-            st.plotly_chart(fig, use_container_width=True)
-# ------------------- Tab 3: Original app5.py -------------------  
-with tab3:
-    st.title("🗺️ COVID-19 District Zone Classification - May 2021")
-    
-    # Load the data
-    df, centroids = load_district_data()
-    
-    # Filter data for May 2021
-    df_may = df[(df['Date'].dt.month == 5) & (df['Date'].dt.year == 2021)]
+            fig = cached_figure(f"density_scatter_{metric}", scatter_version, scatter_states,
+                                lambda: build_scatter('Density', metric, color_scale, f'{title} vs Population Density'))
+            plotly_chart(fig, use_container_width=True)
+
+
+# ------------------- Main App -------------------
+st.title("📊 India COVID-19 Comprehensive Dashboard")
+st.markdown("### A comprehensive view of COVID-19 statistics across India")
+
+tab1, tab2, tab3, tab4 = lazy_tabs([
+    "📈 Overall & Statewise",
+    "🧑👥🧑 Population Analysis",
+    "🗺️ District Classification", 
+    "👫 Age/Gender Analysis"
+], key="india_tab")
+
+# ------------------- Tab 1: Original app1 + app2 + app3 -------------------
+with tab1:
+    if is_open(tab1):
+        # ---------- From app1.py ----------
+        st.title("🫧 COVID-19 Animated Bubble Chart (India - Statewise)")
+        st.markdown("An animated view of how different states fared over time.")
+
+        df = load_covid_data(dataset_version(COVID_FILE_PATH))
+        state_bubble_chart(df)
+
     
-    # Get max values for each district
-    district_max = df_may.groupby("District")[['Confirmed', 'Recovered', 'Deceased']].max().reset_index()
-    dist_merged = pd.merge(district_max, centroids, on="District")
+        # ---------- From app2.py ----------
+        st.title("📊 India COVID-19 Daily Totals")
+        st.markdown("Stacked bar chart of daily total Confirmed, Recovered, and Deceased cases aggregated across all states.")
+
+        def build_daily_totals():
+            # Group data
+            daily = df.groupby("Date")[["Confirmed", "Recovered", "Deceased"]].sum().reset_index()
+
+            # Define more vibrant and visually appealing colors
+            colors = {"Confirmed": "#FF6F61",   # Soft coral red for Confirmed
+                    "Recovered": "#4CAF50",   # Vibrant green for Recovered
+                    "Deceased": "#FFEB3B"}   # Bright yellow for Deceased
+
+            # Create the figure
+            fig = go.Figure()
+
+            # Add bars for each category
+            fig.add_trace(go.Bar(
+                x=daily["Date"],
+                y=daily["Confirmed"],
+                name="Confirmed",
+                marker_color=colors["Confirmed"],
+                hovertemplate="Date: %{x|%Y-%m-%d}<br>Confirmed: %{y:,}<extra></extra>"
+            ))
+
+            fig.add_trace(go.Bar(
+                x=daily["Date"],
+                y=daily["Recovered"],
+                name="Recovered",
+                marker_color=colors["Recovered"],
+                hovertemplate="Date: %{x|%Y-%m-%d}<br>Recovered: %{y:,}<extra></extra>"
+            ))
+
+            fig.add_trace(go.Bar(
+                x=daily["Date"],
+                y=daily["Deceased"],
+                name="Deceased",
+                marker_color=colors["Deceased"],
+                hovertemplate="Date: %{x|%Y-%m-%d}<br>Deceased: %{y:,}<extra></extra>"
+            ))
+
+            # Styling the layout
+            fig.update_layout(
+                barmode="stack",  # Stacking the bars
+                title="📅 COVID-19 Daily Case Totals in India",
+                xaxis_title="Date",
+                yaxis_title="Number of Cases",
+                template="plotly",  # Light mode template
+                bargap=0.05,
+                # plot_bgcolor="white",  # Set background color to white
+                # paper_bgcolor="white",  # Set paper color to white
+                # font=dict(color="black"),  # Set font color to black for visibility
+                showlegend=True,
+                legend=dict(
+                    title="Case Type",
+                    orientation="h",
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="right",
+                    x=1
+                )
+            )
+            return fig
+
+        fig = cached_figure("india_daily_totals", dataset_version(COVID_FILE_PATH), (), build_daily_totals)
+        plotly_chart(fig, use_container_width=True)
+
+
+
+        # ---------- From app3.py ----------
+        st.title("🦠 COVID-19 Confirmed Cases - Animated Race Chart")
+
+        state_race_chart(df)
+
+
+
+# --# ------------------- Tab 2: Original app4 + app6 with state selection -------------------
+with tab2:
+    if is_open(tab2):
+        # State selection (keep this section identical)
+        pop_data = load_population_data(dataset_version(POPULATION_FILE_PATH))
+        covid_latest = load_covid_data(dataset_version(COVID_FILE_PATH)).groupby("State").last().reset_index()
+        merged = pd.merge(covid_latest, pop_data, on="State")
     
-    # Classify the districts based on the number of confirmed cases
-    dist_merged['Classification'] = dist_merged['Confirmed'].apply(
-        lambda c: 'Red' if c >= 20000 else 'Orange' if c >= 5000 else 'Green'
-    )
+        all_states = merged['State'].unique().tolist()
+        mandatory = ["Maharashtra", "Kerala", "Uttar Pradesh"]
+        others = [s for s in all_states if s not in mandatory]
+        default = mandatory + pd.Series(others).sample(4).tolist()[:7]
     
-    # Concatenate Confirmed, Recovered, and Deceased for hover info
-    dist_merged['hover_data'] = (
-        "<b>" + dist_merged['District'] + "</b><br>" +  # Bold the district name
-        "Classification: " + dist_merged['Classification'] + "<br>" +
-        "Latitude: " + dist_merged['Latitude'].astype(str) + "<br>" +
-        "Longitude: " + dist_merged['Longitude'].astype(str) + "<br>" +
-        "Confirmed: " + dist_merged['Confirmed'].astype(str) + "<br>" +
-        "Recovered: " + dist_merged['Recovered'].astype(str) + "<br>" +
-        "Deceased: " + dist_merged['Deceased'].astype(str)
-    )
+        population_charts(merged, all_states, default)
+# ------------------- Tab 3: Original app5.py -------------------  
+with tab3:
+    if is_open(tab3):
+        st.title("🗺️ COVID-19 District Zone Classification - May 2021")
     
-    # Create the scatter mapbox plot
-    fig = px.scatter_mapbox(
-        dist_merged,
-        lat="Latitude",
-        lon="Longitude",
-        color="Classification",
-        color_discrete_map={'Red': 'red', 'Orange': 'orange', 'Green': 'green'},
-        mapbox_style="open-street-map",
-        hover_name="District",  # Keep the district name for hover
-        hover_data={"hover_data": True},  # Use the new hover data field
-        zoom=3.5,
-        height=700
-    )
+        # Load the classified districts
+        district_version = dataset_version(DISTRICT_FILE_PATH, CENTROIDS_FILE_PATH)
+        dist_merged = load_district_zones(district_version)
     
-    # Update hover template to show district name, classification, latitude, longitude, and cases in the desired order
-    fig.update_traces(hovertemplate='%{customdata[0]}')  # Only show the custom hover data field
+        # Create the scatter mapbox plot
+        def build_zone_map():
+            fig = px.scatter_mapbox(
+                dist_merged,
+                lat="Latitude",
+                lon="Longitude",
+                color="Classification",
+                color_discrete_map={'Red': 'red', 'Orange': 'orange', 'Green': 'green'},
+                mapbox_style="open-street-map",
+                hover_name="District",  # Keep the district name for hover
+                hover_data={"hover_data": True},  # Use the new hover data field
+                zoom=3.5,
+                height=700
+            )
     
-    st.plotly_chart(fig, use_container_width=True)
+            # Update hover template to show district name, classification, latitude, longitude, and cases in the desired order
+            fig.update_traces(hovertemplate='%{customdata[0]}')  # Only show the custom hover data field
+            return fig
+
+        fig = cached_figure("district_zone_map", district_version, (), build_zone_map)
+        plotly_chart(fig, use_container_width=True)
     
-    with st.expander("🔍 View Data Table"):
-        st.dataframe(dist_merged.sort_values("Confirmed", ascending=False))
+        with st.expander("🔍 View Data Table"):
+            st.dataframe(dist_merged.sort_values("Confirmed", ascending=False))
 
 
 
 
 # ------------------- Tab 4: Original app9.py -------------------
 with tab4:
-    st.title("COVID-19 Age & Genderwise infection")
-    df = load_age_data()
-    grouped = df.groupby(["gender", "age_group", "current_status"]).size().reset_index(name="count")
-    
-    names = ["Total"]
-    parents = [""]
-    values = [grouped["count"].sum()]
-    
-    for gender in grouped["gender"].unique():
-        gender_total = grouped[grouped["gender"] == gender]["count"].sum()
-        names.append(gender)
-        parents.append("Total")
-        values.append(gender_total)
-        
-        for age_group in grouped["age_group"].unique():
-            age_total = grouped[(grouped["gender"] == gender) & (grouped["age_group"] == age_group)]["count"].sum()
-            label = f"{gender}-{age_group}"
-            names.append(label)
-            parents.append(gender)
-            values.append(age_total)
-            
-            for status in grouped["current_status"].unique():
-                status_total = grouped[(grouped["gender"] == gender) & (grouped["age_group"] == age_group) & (grouped["current_status"] == status)]["count"].sum()
-                names.append(f"{label}-{status}")
-                parents.append(label)
-                values.append(status_total)
+    if is_open(tab4):
+        st.title("COVID-19 Age & Genderwise infection")
+        age_version = dataset_version(AGE_FILE_PATH)
+        def build_sunburst():
+            df = load_age_data(age_version)
+            hierarchy = build_hierarchy(df, ["gender", "age_group", "current_status"])
     
-    fig = px.sunburst(
-        names=names,
-        parents=parents,
-        values=values,
-        title="COVID-19 Sunburst: Gender → Age Group → Status",
-        height=750,
-        color_discrete_sequence=px.colors.qualitative.Vivid  # More vibrant colors
-    )
-    st.plotly_chart(fig, use_container_width=True)
+            return px.sunburst(
+                names=hierarchy["id"],
+                parents=hierarchy["parent"],
+                values=hierarchy["value"],
+                title="COVID-19 Sunburst: Gender → Age Group → Status",
+                height=750,
+                color_discrete_sequence=px.colors.qualitative.Vivid  # More vibrant colors
+            )
+
+        fig = cached_figure("age_gender_sunburst", age_version, (), build_sunburst)
+        plotly_chart(fig, use_container_width=True)
 
 # ------------------- Footer -------------------
 st.markdown("---")
 st.markdown("<center style='color: grey;'>Task 6: Analyzing COVID-19 impact in India</center>", unsafe_allow_html=True)
+
+show_stats()
+show_fragment_log()
@@ -2,9 +2,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 import os
 import warnings
 
+from utils.asof import AsOfIndex
+from utils.figure_cache import cached_figure, dataset_version, show_stats
+from utils.fragments import show_fragment_log, timed_fragment
+from utils.entities import countries_only
+from utils.render import plotly_chart
+from utils.tables import read_table
+
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 # Set page configuration
@@ -13,28 +21,88 @@ st.set_page_config(page_title="Daily Vaccination & Recovery Dashboard", layout="
 # Constants
 DATA_FILE_PATH = os.path.join("Datasets","Daily Analysis","daily_analysis_data.csv")
 
+# Every cached loader takes the dataset version, so a rebuilt file is read again
 @st.cache_data
-def load_cleaned_temporal_data():
-    df = pd.read_csv(DATA_FILE_PATH)
+def load_daily_analysis_data(version):
+    df = read_table(DATA_FILE_PATH)
     df["date"] = pd.to_datetime(df["date"])
-    exclude_keywords = [
-        "World", "income", "countries", "region", "European Union", "Asia", "Africa",
-        "America", "Oceania", "Other", "High-income", "Upper-middle", "Lower-middle",
-        "Low-income", "International", "EU", "excl."
-    ]
-    df = df[~df["country"].str.contains('|'.join(exclude_keywords), case=False, na=False)]
     return df
 
-temporal_df = load_cleaned_temporal_data()
+@st.cache_data
+def load_cleaned_temporal_data(version):
+    return countries_only(load_daily_analysis_data(version))
+
+# Countries with a reported case or death, indexed by date for the per-day bubble chart
+@st.cache_resource
+def load_valid_day_index(version):
+    valid_day_data = load_cleaned_temporal_data(version).dropna(subset=["new_cases", "new_deaths"])
+    valid_day_data = valid_day_data[(valid_day_data["new_cases"] > 0) | (valid_day_data["new_deaths"] > 0)]
+    return AsOfIndex(valid_day_data, "country", "date")
+
+# Bubble chart of one date, rerun on its own when the mode or the countries change
+@timed_fragment
+def bubble_chart(valid_day_index, selected_date, country_list, default_countries):
+    # Chart mode selection
+    bubble_mode = st.radio(
+        "🫧 Bubble Chart Mode",
+        options=["All Countries", "Top 10 by New Cases", "Top 10 by New Deaths", "Custom Selection"],
+        index=0,
+        horizontal=True
+    )
+
+    selected_countries = []
+    if bubble_mode == "Custom Selection":
+        selected_countries = st.multiselect(
+            "🌍 Select Countries or Aggregated Regions",
+            options=country_list,
+            default=default_countries
+        )
+
+    bubble_data = valid_day_index.on(selected_date)
+
+    if bubble_mode == "Custom Selection":
+        bubble_data = bubble_data[bubble_data["country"].isin(selected_countries)]
+    else:
+        bubble_data = countries_only(bubble_data)
+        if bubble_mode == "Top 10 by New Cases":
+            bubble_data = bubble_data.nlargest(10, "new_cases")
+        elif bubble_mode == "Top 10 by New Deaths":
+            bubble_data = bubble_data.nlargest(10, "new_deaths")
+
+    if bubble_data.empty:
+        st.warning("⚠ No data available for this selection on this date.")
+    else:
+        fig_bubble = px.scatter(
+            bubble_data,
+            x="new_cases",
+            y="new_deaths",
+            size="new_cases",
+            color="new_deaths",
+            hover_name="country",
+            color_continuous_scale="Reds",
+            size_max=60,
+            title=f"Date – {selected_date} ({bubble_mode})",
+            labels={"new_cases": "New Cases", "new_deaths": "New Deaths"}
+        )
+        fig_bubble.update_layout(
+            xaxis_title="New Cases",
+            yaxis_title="New Deaths",
+            height=600,
+            margin=dict(l=80, r=40, t=60, b=40)
+        )
+        plotly_chart(fig_bubble, use_container_width=True)
+
+data_version = dataset_version(DATA_FILE_PATH)
+temporal_df = load_cleaned_temporal_data(data_version)
 
 
 
 # Peak values with dates
-peak_cases = temporal_df.loc[temporal_df.groupby("country")["new_cases"].idxmax()]
+peak_cases = temporal_df.loc[temporal_df.groupby("country", observed=True)["new_cases"].idxmax()]
 top10_cases_peak = peak_cases.nlargest(10, "new_cases")[["country", "new_cases", "date"]]
 top10_cases_peak["date_str"] = top10_cases_peak["date"].dt.strftime("%Y-%m-%d")
 
-peak_deaths = temporal_df.loc[temporal_df.groupby("country")["new_deaths"].idxmax()]
+peak_deaths = temporal_df.loc[temporal_df.groupby("country", observed=True)["new_deaths"].idxmax()]
 top10_deaths_peak = peak_deaths.nlargest(10, "new_deaths")[["country", "new_deaths", "date"]]
 top10_deaths_peak["date_str"] = top10_deaths_peak["date"].dt.strftime("%Y-%m-%d")
 
@@ -53,7 +121,7 @@ with col1:
     fig_peak_cases.update_traces(
         hovertemplate="<b>%{label}</b><br>New Cases: %{value:,}<br>Date: %{customdata[0]}<extra></extra>"
     )
-    st.plotly_chart(fig_peak_cases, use_container_width=True)
+    plotly_chart(fig_peak_cases, use_container_width=True)
 
 with col2:
     st.markdown("Top 10 Countries by Highest Daily New Deaths")
@@ -68,7 +136,7 @@ with col2:
     fig_peak_deaths.update_traces(
         hovertemplate="<b>%{label}</b><br>New Deaths: %{value:,}<br>Date: %{customdata[0]}<extra></extra>"
     )
-    st.plotly_chart(fig_peak_deaths, use_container_width=True)
+    plotly_chart(fig_peak_deaths, use_container_width=True)
 
 
 # Sidebar Filters
@@ -77,80 +145,21 @@ with st.sidebar:
     st.header("Filters")
 
     # Filter valid dates
-    valid_day_data = temporal_df.dropna(subset=["new_cases", "new_deaths"])
-    valid_day_data = valid_day_data[(valid_day_data["new_cases"] > 0) | (valid_day_data["new_deaths"] > 0)]
-    valid_dates = pd.to_datetime(valid_day_data["date"].unique()).date
+    valid_day_index = load_valid_day_index(data_version)
+    valid_dates = pd.to_datetime(valid_day_index.dates).date
     min_date = min(valid_dates)
     max_date = max(valid_dates)
 
     selected_date = st.date_input("📅 Select a Date", value=max_date, min_value=min_date, max_value=max_date)
 
 
-    # Chart mode selection
-    bubble_mode = st.radio(
-        "🫧 Bubble Chart Mode",
-        options=["All Countries", "Top 10 by New Cases", "Top 10 by New Deaths", "Custom Selection"],
-        index=0
-    )
-
-    # Country list with optional aggregates
-    exclude_keywords = [
-        "World", "income", "countries", "region", "European Union", "Asia", "Africa",
-        "America", "Oceania", "Other", "High-income", "Upper-middle", "Lower-middle",
-        "Low-income", "International", "EU", "excl."
-    ]
-
-    full_country_list = sorted(pd.read_csv(DATA_FILE_PATH)["country"].unique())
-    selected_countries = []
-
-    if bubble_mode == "Custom Selection":
-        default_top10_countries = top10_cases_peak["country"].tolist()
-        selected_countries = st.multiselect(
-            "🌍 Select Countries or Aggregated Regions",
-            options=full_country_list,
-            default=default_top10_countries
-        )
-
-
 # Bubble Chart
 # -------------------------
 st.subheader("🫧 New Cases vs New Deaths")
 
-bubble_data = valid_day_data[valid_day_data["date"].dt.date == selected_date]
-
-if bubble_mode == "Custom Selection":
-    bubble_data = bubble_data[bubble_data["country"].isin(selected_countries)]
-else:
-    bubble_data = bubble_data[
-        ~bubble_data["country"].str.contains('|'.join(exclude_keywords), case=False, na=False)
-    ]
-    if bubble_mode == "Top 10 by New Cases":
-        bubble_data = bubble_data.nlargest(10, "new_cases")
-    elif bubble_mode == "Top 10 by New Deaths":
-        bubble_data = bubble_data.nlargest(10, "new_deaths")
-
-if bubble_data.empty:
-    st.warning("⚠ No data available for this selection on this date.")
-else:
-    fig_bubble = px.scatter(
-        bubble_data,
-        x="new_cases",
-        y="new_deaths",
-        size="new_cases",
-        color="new_deaths",
-        hover_name="country",
-        color_continuous_scale="Reds",
-        size_max=60,
-        title=f"Date – {selected_date} ({bubble_mode})",
-        labels={"new_cases": "New Cases", "new_deaths": "New Deaths"}
-    )
-    fig_bubble.update_layout(
-        xaxis_title="New Cases",
-        yaxis_title="New Deaths",
-        height=600,
-        margin=dict(l=80, r=40, t=60, b=40)
-    )
-    st.plotly_chart(fig_bubble, use_container_width=True)
+# Country list with optional aggregates
+full_country_list = sorted(load_daily_analysis_data(data_version)["country"].unique())
+bubble_chart(valid_day_index, selected_date, full_country_list, top10_cases_peak["country"].tolist())
 
 
 # Bar Race Animation
@@ -161,34 +170,44 @@ animation_end = selected_date
 animation_end = pd.to_datetime(animation_end)
 
 
-# Animation data is independent of sidebar filter
-anim_data = temporal_df[temporal_df["date"] <= animation_end]
-
-top10_cases_frames = (
-    anim_data.sort_values(["date", "new_cases"], ascending=[True, False])
-    .groupby("date").head(10)
-)
-top10_deaths_frames = (
-    anim_data.sort_values(["date", "new_deaths"], ascending=[True, False])
-    .groupby("date").head(10)
-)
-dates = top10_cases_frames["date"].sort_values().unique()
+BAR_RACE_BUCKETS = {
+    "new_deaths": [10000, 50000, 100000, 250000],
+    "new_cases": [10000,50000, 100000,150000,200000, 250000,300000,350000,400000,450000, 500000, 1000000, 2000000],
+}
 
-def build_adaptive_bar_race(df, value_col, title, color_scale):
-    # Define bucket thresholds
-    if value_col == "new_deaths":
-        buckets = [10000, 50000, 100000, 250000]
-    else:
-        buckets = [10000,50000, 100000,150000,200000, 250000,300000,350000,400000,450000, 500000, 1000000, 2000000]
+@st.cache_data
+def load_bar_race_partitions(value_col, version):
+    """
+    Top 10 countries of every date by value_col, partitioned once by date: the rows of the
+    i-th date are values[offsets[i]:offsets[i + 1]] (and the same slice of countries).
+    """
+    df = load_cleaned_temporal_data(version)
+    top10 = df.sort_values(["date", value_col], ascending=[True, False]).groupby("date").head(10)
+    dates = top10["date"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    offsets = np.r_[starts, len(top10)]
+    date_labels = pd.DatetimeIndex(dates[starts]).strftime('%Y-%m-%d').to_numpy()
+    return date_labels, offsets, top10[value_col].to_numpy(), top10["country"].astype(str).to_numpy()
+
+@st.cache_resource
+def load_bar_race_frames(value_col, color_scale, version):
+    """
+    Animation frames and slider steps for every date, built in one pass over the partitions.
+    The x-axis bucket of a frame only depends on the dates before it, so the frames of any
+    end date are a prefix of these lists.
+    """
+    date_labels, offsets, values, countries = load_bar_race_partitions(value_col, version)
+    buckets = BAR_RACE_BUCKETS.get(value_col, BAR_RACE_BUCKETS["new_cases"])
 
     # Start with the smallest bucket
     current_bucket_idx = 0
     current_bucket = buckets[current_bucket_idx]
 
-    frames = []
-    for date in dates:
-        daily_data = df[df["date"] == date]
-        max_val = daily_data[value_col].max()
+    frames, steps = [], []
+    for i, date_str in enumerate(date_labels):
+        day_values = values[offsets[i]:offsets[i + 1]]
+        day_countries = countries[offsets[i]:offsets[i + 1]]
+        max_val = np.nanmax(day_values) if not np.isnan(day_values).all() else np.nan
 
         # Increase bucket only if the max_val crosses the current bucket
         if max_val > current_bucket and current_bucket_idx < len(buckets) - 1:
@@ -196,16 +215,15 @@ def build_adaptive_bar_race(df, value_col, title, color_scale):
                 current_bucket_idx += 1
             current_bucket = buckets[current_bucket_idx]
 
-        date_str = pd.to_datetime(str(date)).strftime('%Y-%m-%d')
         frames.append(
             go.Frame(
                 data=[go.Bar(
-                x=daily_data[value_col],
-                y=daily_data["country"],
+                x=day_values,
+                y=day_countries,
                 orientation='h',
-                marker=dict(color=daily_data[value_col], colorscale=color_scale),
+                marker=dict(color=day_values, colorscale=color_scale),
                 hovertemplate='%{y}: %{x:,.0f}<extra></extra>',
-                text=daily_data["country"],                 # <-- Only country name outside bar
+                text=day_countries,                 # <-- Only country name outside bar
                 textposition="outside",
             )],
 
@@ -215,21 +233,29 @@ def build_adaptive_bar_race(df, value_col, title, color_scale):
                 )
             )
         )
+        steps.append(dict(method="animate", args=[[date_str], {"mode": "immediate"}], label=date_str))
+    return frames, steps
+
+def build_adaptive_bar_race(value_col, title, color_scale, end_date, version):
+    date_labels, offsets, values, countries = load_bar_race_partitions(value_col, version)
+    frames, steps = load_bar_race_frames(value_col, color_scale, version)
+    buckets = BAR_RACE_BUCKETS.get(value_col, BAR_RACE_BUCKETS["new_cases"])
+
+    # Animation data is independent of sidebar filter: all dates up to the selected one
+    n_dates = np.searchsorted(date_labels, end_date.strftime('%Y-%m-%d'), side="right")
 
     # Initial frame uses the smallest bucket
-    first_date = dates[0]
-    init_data = df[df["date"] == first_date]
-    first_date_str = pd.to_datetime(str(first_date)).strftime('%Y-%m-%d')
+    first_end = offsets[1]
 
     fig = go.Figure(
         data=[go.Bar(
-        x=init_data[value_col],
-        y=init_data["country"],
+        x=values[:first_end],
+        y=countries[:first_end],
         orientation='h',
-        marker=dict(color=init_data[value_col], colorscale=color_scale),
+        marker=dict(color=values[:first_end], colorscale=color_scale),
         hovertemplate='%{y}: %{x:,.0f}<extra></extra>',
         width=0.7,
-        text=init_data["country"],                 # <-- Only country name outside bar
+        text=countries[:first_end],                 # <-- Only country name outside bar
         textposition="outside",
     )],
 
@@ -262,14 +288,7 @@ def build_adaptive_bar_race(df, value_col, title, color_scale):
             height=550,
             width=800,
             sliders=[dict(
-                steps=[
-                    dict(
-                        method="animate",
-                        args=[[pd.to_datetime(str(date)).strftime('%Y-%m-%d')], {"mode": "immediate"}],
-                        label=pd.to_datetime(str(date)).strftime('%Y-%m-%d')
-                    )
-                    for date in dates
-                ],
+                steps=steps[:n_dates],
                 transition={"duration": 0},
                 x=0.1,
                 xanchor="left",
@@ -307,19 +326,20 @@ def build_adaptive_bar_race(df, value_col, title, color_scale):
                 ]
             )]
         ),
-        frames=frames
+        frames=frames[:n_dates]
     )
     return fig
 
+# The races only change with the dataset and the selected end date
+fig_cases = cached_figure("bar_race_new_cases", data_version, animation_end, lambda: build_adaptive_bar_race(
+    "new_cases", "Top 10 Countries by New Cases Over Time", "Blues", animation_end, data_version
+))
+fig_deaths = cached_figure("bar_race_new_deaths", data_version, animation_end, lambda: build_adaptive_bar_race(
+    "new_deaths", "Top 10 Countries by New Deaths Over Time", "Reds", animation_end, data_version
+))
 
+plotly_chart(fig_cases, use_container_width=True)
+plotly_chart(fig_deaths, use_container_width=True)
 
-fig_cases = build_adaptive_bar_race(
-    top10_cases_frames, "new_cases", "Top 10 Countries by New Cases Over Time", "Blues"
-)
-fig_deaths = build_adaptive_bar_race(
-    top10_deaths_frames, "new_deaths", "Top 10 Countries by New Deaths Over Time", "Reds"
-)
-
-st.plotly_chart(fig_cases, use_container_width=True)
-st.plotly_chart(fig_deaths, use_container_width=True)
-
+show_stats()
+show_fragment_log()
@@ -5,32 +5,163 @@ from datetime import datetime
 import plotly.graph_objects as go
 import os
 
+from utils import animation
+from utils.asof import AsOfIndex
+from utils.downsample import downsampled_chart
+from utils.entities import countries_only, is_aggregate
+from utils.fragments import show_fragment_log, timed_fragment
+from utils.render import plotly_chart
+from utils.tables import read_table, is_current, table_mtime
+
 vaccination_data = os.path.join("Datasets","Daily Analysis","daily_vaccinations_and_icu_all_countries_data.csv")
 recovery_data = os.path.join("Datasets","Daily Analysis","active_cases_and_estimated_recovery_data.csv")
-# Load vaccination and ICU data
+recovery_monthly_data = os.path.join("Datasets","Daily Analysis","recovery_monthly.csv")
+# Load vaccination and ICU data; every cached loader takes the version of the files it reads
 @st.cache_data
-def load_data():
-    df = pd.read_csv(vaccination_data)
+def load_data(version):
+    df = read_table(vaccination_data)
     df["date"] = pd.to_datetime(df["date"])
     return df
 
 @st.cache_data
-def load_recovery_data():
-    df = pd.read_csv(recovery_data)
+def load_recovery_data(version):
+    df = read_table(recovery_data)
     df["date"] = pd.to_datetime(df["date"])
     return df
 
+# Monthly mean recovery rate per country, precomputed by Data Processing/monthly_snapshots.py
+@st.cache_data
+def load_monthly_recovery(monthly_version, recovery_version):
+    if is_current(recovery_monthly_data, recovery_data):
+        monthly_avg = read_table(recovery_monthly_data)
+        monthly_avg["month"] = pd.to_datetime(monthly_avg["month"])
+        return monthly_avg
+    recovery_df = load_recovery_data(recovery_version)
+    recovery_df["month"] = recovery_df["date"].dt.to_period("M").dt.to_timestamp()
+    return recovery_df.groupby(["month", "country"], as_index=False, observed=True)["estimated_recovery_rate"].mean()
+
+# Per-date country snapshots of both datasets, shared by all sessions
+@st.cache_resource
+def load_snapshot_indexes(vaccination_version, recovery_version):
+    return (AsOfIndex(load_data(vaccination_version), "country", "date"),
+            AsOfIndex(load_recovery_data(recovery_version), "country", "date"))
+
+# Active vs recovered bars of one date, rerun on their own when the mode or the countries change
+@timed_fragment
+def recovery_bars_chart(recovery_snapshot, selected_date):
+    bar_mode = st.radio("Select Data Mode", ["Top 10 Active Cases", "Custom Country Selection"], horizontal=True)
+
+    if bar_mode == "Custom Country Selection":
+        custom_countries = st.multiselect(
+           "Select countries for custom selection",
+            options=sorted(recovery_snapshot["country"].unique()),
+            default=["India", "United States", "Brazil"]
+        )
+        recovery_bar_data = recovery_snapshot[recovery_snapshot["country"].isin(custom_countries)]
+    else:
+        recovery_bar_data = countries_only(recovery_snapshot).nlargest(10, "active_cases")
+
+    if not recovery_bar_data.empty:
+        long_df = pd.melt(
+            recovery_bar_data,
+            id_vars=["country"],
+            value_vars=["active_cases", "estimated_recovered"],
+            var_name="Metric",
+            value_name="Value"
+        )
+
+        # Custom tooltip notes
+        hover_map = {
+            "active_cases": "Real-time snapshot of currently infected individuals",
+            "estimated_recovered": "Recovered estimate from cases ~14 days ago"
+        }
+        long_df["Metric Description"] = long_df["Metric"].map(hover_map)
+
+        fig_grouped_bar = px.bar(
+            long_df,
+            x="country",
+            y="Value",
+            color="Metric",
+            barmode="group",
+            hover_data=["Metric Description"],
+            title=f"Active Cases (Real-Time) vs Estimated Recovered (~14 Days Prior) – {selected_date}",
+            color_discrete_map={
+                "active_cases": "orange",
+                "estimated_recovered": "green"
+            }
+        )
+
+        fig_grouped_bar.update_layout(height=600, xaxis_title="Country", yaxis_title="People")
+        plotly_chart(fig_grouped_bar, use_container_width=True)
+    else:
+        st.info("ℹ No data available for the selected countries and date.")
+
+# Recovery rate of the selected countries, rerun on its own when the countries change
+@timed_fragment
+def recovery_rate_chart(recovery_df, default_countries):
+    # Multiselect UI
+    # Multiselect UI with label for the "Estimated Recovery Rate Over Time" chart
+    selected_countries = st.multiselect(
+        label="Select Countries to Visualize Recovery Rate",  # Added label argument
+        options=sorted(recovery_df["country"].unique()),
+        default=default_countries
+    )
+
+
+    # Filter for selected countries and valid dates
+    line_df = recovery_df[
+        (recovery_df["country"].isin(selected_countries)) &
+        (recovery_df["date"].dt.date <= MAX_DATE) &
+        ~is_aggregate(recovery_df["country"])
+    ]
+
+    # Draw line chart with slider preview
+    if not line_df.empty:
+        fig_line = go.Figure()
+
+        for country in selected_countries:
+            country_data = line_df[line_df["country"] == country]
+            fig_line.add_trace(go.Scatter(
+                x=country_data["date"],
+                y=country_data["estimated_recovery_rate"],
+                mode="lines+markers",
+                name=country,
+
+            ))
+
+        fig_line.update_layout(
+            title="Estimated Recovery Rate Over Time",
+            xaxis=dict(
+                rangeselector=dict(
+                    buttons=[
+                        dict(count=1, label="1m", step="month", stepmode="backward"),
+                        dict(count=6, label="6m", step="month", stepmode="backward"),
+                        dict(count=1, label="YTD", step="year", stepmode="todate"),
+                        dict(count=1, label="1y", step="year", stepmode="backward"),
+                        dict(step="all")
+                    ]
+                ),
+                rangeslider=dict(visible=True),  #Enables preview in slider
+                type="date"
+            ),
+            yaxis=dict(title="Recovery Rate", tickformat=".0%", range=[0, 1]),
+            height=500,
+            margin=dict(l=40, r=40, t=60, b=40),
+            template="plotly_white"
+        )
+
+        downsampled_chart(fig_line, 'recovery_rate', use_container_width=True)
+    else:
+        st.info("⚠ No recovery data available for the selected countries.")
+
 # Load datasets
-df = load_data()
-recovery_df = load_recovery_data()
+vaccination_version = table_mtime(vaccination_data)
+recovery_version = table_mtime(recovery_data)
+df = load_data(vaccination_version)
+recovery_df = load_recovery_data(recovery_version)
 
 # Define global constants
 MAX_DATE = datetime(2024, 1, 1).date()
-exclude_keywords = [
-    "World", "income", "countries", "region", "European Union", "Asia", "Africa",
-    "America", "Oceania", "Other", "High-income", "Upper-middle", "Lower-middle",
-    "Low-income", "International", "EU", "excl."
-]
 
 # Sidebar filter for date
 st.sidebar.header("Filters")
@@ -43,16 +174,15 @@ selected_date = st.sidebar.date_input(
 )
 
 # Top 10 countries for selected date (non-aggregated)
-df_filtered = df[df["date"].dt.date == selected_date].copy()
-df_filtered = df_filtered[~df_filtered["country"].str.contains('|'.join(exclude_keywords), case=False, na=False)]
+vaccination_index, recovery_index = load_snapshot_indexes(vaccination_version, recovery_version)
+df_filtered = vaccination_index.on(selected_date)
+df_filtered = countries_only(df_filtered)
 top10_countries = df_filtered.nlargest(10, "daily_vaccinations")["country"]
 df_top10 = df_filtered[df_filtered["country"].isin(top10_countries)]
 
 # Compute monthly recovery stats
-recovery_df["month"] = recovery_df["date"].dt.to_period("M").dt.to_timestamp()
-monthly_avg = recovery_df.groupby(["month", "country"], as_index=False)["estimated_recovery_rate"].mean()
+monthly_avg = load_monthly_recovery(table_mtime(recovery_monthly_data), recovery_version)
 monthly_avg["estimated_recovery_rate_percent"] = monthly_avg["estimated_recovery_rate"] * 100
-monthly_avg["month_str"] = monthly_avg["month"].dt.strftime("%Y-%m")
 
 # App title
 st.title("Daily Vaccination & Recovery Dashboard")
@@ -82,7 +212,7 @@ if not df_top10.empty:
                 title=title
             )
             fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
 
     
     if "daily_occupancy_icu" in df_top10.columns:
@@ -106,7 +236,7 @@ if not df_top10.empty:
                 height=400,
                 yaxis=dict(autorange="reversed")  # Highest ICU at top
             )
-            st.plotly_chart(fig_icu, use_container_width=True)
+            plotly_chart(fig_icu, use_container_width=True)
         else:
             st.info("⚠ No ICU occupancy data available for the selected date.")
             
@@ -115,78 +245,38 @@ if not df_top10.empty:
 # -------------------------
 st.subheader("📊 Active vs Recovered Cases by Country (Selected Date)")
 
-recovery_snapshot = recovery_df[recovery_df["date"].dt.date == selected_date].copy()
+recovery_snapshot = recovery_index.on(selected_date)
 
-bar_mode = st.radio("Select Data Mode", ["Top 10 Active Cases", "Custom Country Selection"], horizontal=True)
-
-if bar_mode == "Custom Country Selection":
-    custom_countries = st.multiselect(
-       "Select countries for custom selection",
-        options=sorted(recovery_snapshot["country"].unique()),
-        default=["India", "United States", "Brazil"]
-    )
-    recovery_bar_data = recovery_snapshot[recovery_snapshot["country"].isin(custom_countries)]
-else:
-    non_aggregated = ~recovery_snapshot["country"].str.contains('|'.join(exclude_keywords), case=False, na=False)
-    recovery_bar_data = recovery_snapshot[non_aggregated].nlargest(10, "active_cases")
-
-if not recovery_bar_data.empty:
-    long_df = pd.melt(
-        recovery_bar_data,
-        id_vars=["country"],
-        value_vars=["active_cases", "estimated_recovered"],
-        var_name="Metric",
-        value_name="Value"
-    )
-
-    # Custom tooltip notes
-    hover_map = {
-        "active_cases": "Real-time snapshot of currently infected individuals",
-        "estimated_recovered": "Recovered estimate from cases ~14 days ago"
-    }
-    long_df["Metric Description"] = long_df["Metric"].map(hover_map)
-
-    fig_grouped_bar = px.bar(
-        long_df,
-        x="country",
-        y="Value",
-        color="Metric",
-        barmode="group",
-        hover_data=["Metric Description"],
-        title=f"Active Cases (Real-Time) vs Estimated Recovered (~14 Days Prior) – {selected_date}",
-        color_discrete_map={
-            "active_cases": "orange",
-            "estimated_recovered": "green"
-        }
-    )
-
-    fig_grouped_bar.update_layout(height=600, xaxis_title="Country", yaxis_title="People")
-    st.plotly_chart(fig_grouped_bar, use_container_width=True)
-else:
-    st.info("ℹ No data available for the selected countries and date.")
+recovery_bars_chart(recovery_snapshot, selected_date)
 
 # -------------------------
 #Monthly Choropleth Map
 # -------------------------
 st.subheader("🌍 Monthly Animated Choropleth Map: Estimated Recovery Rate")
 
-choropleth_data = monthly_avg.dropna(subset=["estimated_recovery_rate_percent"])
+choropleth_data, map_resolution = animation.budgeted_frames(
+    monthly_avg.dropna(subset=["estimated_recovery_rate_percent"]), "month", "country",
+    value_columns=["estimated_recovery_rate_percent"],
+    plotted_columns=["country", "estimated_recovery_rate_percent"],
+    how="mean", resolutions=["monthly", "quarterly"]
+)
 fig_map = px.choropleth(
     choropleth_data,
     locations="country",
     locationmode="country names",
     color="estimated_recovery_rate_percent",
-    animation_frame="month_str",
+    animation_frame="frame",
     hover_name="country",
     color_continuous_scale="Greens",
     range_color=[0, 100],
     title="🗺 Monthly Recovery Rate by Country",
-    labels={"month_str": "Date "}  # <--- This changes the slider label
+    labels={"frame": "Date "}  # <--- This changes the slider label
 )
 
 fig_map.update_geos(showcoastlines=True, showframe=False, projection_type="natural earth")
 fig_map.update_layout(margin=dict(l=40, r=40, t=60, b=20))
-st.plotly_chart(fig_map, use_container_width=True)
+plotly_chart(fig_map, use_container_width=True)
+st.caption(animation.resolution_caption(choropleth_data, map_resolution))
 
 
 # -------------------------
@@ -195,60 +285,9 @@ st.plotly_chart(fig_map, use_container_width=True)
 st.subheader("📈 Estimated Recovery Rate Over Time")
 
 # Top 3 real countries by total cases
-non_agg = recovery_df[~recovery_df["country"].str.contains('|'.join(exclude_keywords), case=False, na=False)]
-top3_countries = non_agg.groupby("country")["total_cases"].max().nlargest(3).index.tolist()
-
-# Multiselect UI
-# Multiselect UI with label for the "Estimated Recovery Rate Over Time" chart
-selected_countries = st.multiselect(
-    label="Select Countries to Visualize Recovery Rate",  # Added label argument
-    options=sorted(recovery_df["country"].unique()),
-    default=top3_countries
-)
-
+non_agg = countries_only(recovery_df)
+top3_countries = non_agg.groupby("country", observed=True)["total_cases"].max().nlargest(3).index.tolist()
 
-# Filter for selected countries and valid dates
-line_df = recovery_df[
-    (recovery_df["country"].isin(selected_countries)) &
-    (recovery_df["date"].dt.date <= MAX_DATE) &
-    ~recovery_df["country"].str.contains('|'.join(exclude_keywords), case=False, na=False)
-]
-
-# Draw line chart with slider preview
-if not line_df.empty:
-    fig_line = go.Figure()
-
-    for country in selected_countries:
-        country_data = line_df[line_df["country"] == country]
-        fig_line.add_trace(go.Scatter(
-            x=country_data["date"],
-            y=country_data["estimated_recovery_rate"],
-            mode="lines+markers",
-            name=country,
-           
-        ))
-
-    fig_line.update_layout(
-        title="Estimated Recovery Rate Over Time",
-        xaxis=dict(
-            rangeselector=dict(
-                buttons=[
-                    dict(count=1, label="1m", step="month", stepmode="backward"),
-                    dict(count=6, label="6m", step="month", stepmode="backward"),
-                    dict(count=1, label="YTD", step="year", stepmode="todate"),
-                    dict(count=1, label="1y", step="year", stepmode="backward"),
-                    dict(step="all")
-                ]
-            ),
-            rangeslider=dict(visible=True),  #Enables preview in slider
-            type="date"
-        ),
-        yaxis=dict(title="Recovery Rate", tickformat=".0%", range=[0, 1]),
-        height=500,
-        margin=dict(l=40, r=40, t=60, b=40),
-        template="plotly_white"
-    )
+recovery_rate_chart(recovery_df, top3_countries)
 
-    st.plotly_chart(fig_line, use_container_width=True)
-else:
-    st.info("⚠ No recovery data available for the selected countries.")
+show_fragment_log()
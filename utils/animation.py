@@ -0,0 +1,74 @@
+import os
+import pandas as pd
+
+# Temporal resolutions an animation can be rendered at, finest first
+RESOLUTIONS = ['daily', 'weekly', 'monthly', 'quarterly']
+PERIODS = {'daily': 'D', 'weekly': 'W', 'monthly': 'M', 'quarterly': 'Q'}
+FRAME_LABELS = {'daily': '%Y-%m-%d', 'weekly': '%Y-%m-%d', 'monthly': '%Y-%m', 'quarterly': None}
+
+# Budget for one animated figure; can be raised for fast clients through the environment
+MAX_FRAMES = int(os.environ.get('ANIMATION_MAX_FRAMES', 120))
+MAX_BYTES = int(float(os.environ.get('ANIMATION_MAX_MB', 5)) * 2**20)
+
+# Approximate JSON overhead per plotted point (separators, quotes) on top of the values themselves
+POINT_OVERHEAD_BYTES = 6
+SAMPLE_ROWS = 1000
+
+def estimate_bytes(df, columns):
+    """Rough size of the JSON plotly sends for df's rows: the text length of every plotted value."""
+    if len(df) == 0:
+        return 0
+    sample = df[columns].sample(min(len(df), SAMPLE_ROWS), random_state=0)
+    bytes_per_row = sum(sample[col].astype(str).str.len().mean() + POINT_OVERHEAD_BYTES for col in columns)
+    return int(bytes_per_row * len(df))
+
+def choose_resolution(df, date_col, key_col, columns, resolutions=RESOLUTIONS,
+                      max_frames=MAX_FRAMES, max_bytes=MAX_BYTES):
+    """
+    The finest of resolutions whose animation stays within max_frames frames and about
+    max_bytes of point data, or the coarsest one if none does.
+    """
+    dates = pd.to_datetime(df[date_col])
+    keys = df[key_col].nunique()
+    bytes_per_row = estimate_bytes(df, columns) / max(len(df), 1)
+    for resolution in resolutions:
+        frames = dates.dt.to_period(PERIODS[resolution]).nunique()
+        # At most one point per key and frame once aggregated
+        points = min(len(df), frames * keys)
+        if frames <= max_frames and points * bytes_per_row <= max_bytes:
+            return resolution
+    return resolutions[-1]
+
+def frame_label(dates, resolution):
+    period = dates.dt.to_period(PERIODS[resolution])
+    if FRAME_LABELS[resolution] is None:
+        return period.astype(str)
+    return period.dt.start_time.dt.strftime(FRAME_LABELS[resolution])
+
+def aggregate_frames(df, date_col, key_col, resolution, value_columns, how='last'):
+    """
+    One row per key_col and period of the resolution, with a 'frame' label column, sorted so
+    frames appear in date order. value_columns are reduced with how ('last' for cumulative
+    totals and snapshots, 'mean' for rates); the other columns keep their last value.
+    """
+    df = df.sort_values(date_col, kind='stable')
+    df = df.assign(frame=frame_label(pd.to_datetime(df[date_col]), resolution))
+    if resolution == 'daily':
+        return df.reset_index(drop=True)
+
+    grouped = df.groupby([key_col, 'frame'], sort=False, observed=True)
+    result = grouped.last()
+    if how != 'last':
+        result[value_columns] = grouped[value_columns].agg(how)
+    # Frame labels sort in date order at every resolution
+    return result.reset_index().sort_values(['frame', key_col], kind='stable').reset_index(drop=True)
+
+def budgeted_frames(df, date_col, key_col, value_columns, plotted_columns, how='last',
+                    resolutions=RESOLUTIONS, max_frames=MAX_FRAMES, max_bytes=MAX_BYTES):
+    """Picks the resolution for the budget and aggregates df to it. Returns (frames_df, resolution)."""
+    resolution = choose_resolution(df, date_col, key_col, plotted_columns, resolutions, max_frames, max_bytes)
+    return aggregate_frames(df, date_col, key_col, resolution, value_columns, how), resolution
+
+def resolution_caption(frames_df, resolution):
+    return (f"Animation resolution: {resolution} ({frames_df['frame'].nunique()} frames). "
+            f"Finer resolutions are used when they fit within {MAX_FRAMES} frames and about {MAX_BYTES / 2**20:g} MB.")
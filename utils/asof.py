@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+class AsOfIndex:
+    """
+    Each key's latest row at or before a date, for every key at once.
+
+    The frame is sorted once by (key, date) and every row gets a combined integer
+    position key_code * n_dates + date_rank, which increases along the sorted rows. The
+    latest row of every key at or before a date is then one vectorized binary search per
+    key, O(keys * log rows), instead of a sort and groupby over the whole frame.
+
+    With skipna=True every column takes the latest non-missing value of its key (as
+    groupby(key).last() does) instead of the value on the latest row.
+    The frame must not be modified while it is indexed; results are new frames.
+    """
+    def __init__(self, df, key_col, date_col, skipna=False):
+        df = df[df[key_col].notna() & df[date_col].notna()]
+        dates = pd.to_datetime(df[date_col]).to_numpy().astype('datetime64[ns]')
+        codes, self.keys = pd.factorize(df[key_col], sort=True)
+        self.dates, date_ranks = np.unique(dates, return_inverse=True)
+
+        order = np.lexsort((dates, codes))
+        self.df = df.iloc[order].reset_index(drop=True)
+        self.frame_rows = order
+        self.key_col, self.date_col, self.skipna = key_col, date_col, skipna
+        self.sorted_dates = dates[order]
+        self.positions = codes[order].astype(np.int64) * len(self.dates) + date_ranks.reshape(-1)[order]
+        # First sorted row of every key
+        self.key_starts = np.searchsorted(self.positions, np.arange(len(self.keys)) * len(self.dates))
+
+        if skipna:
+            # For every row and column, the row of the latest non-missing value up to it; rows
+            # of an earlier key (before the key's first row) mean the key has none yet
+            row_numbers = np.arange(len(self.df))
+            self.last_valid = {col: np.maximum.accumulate(np.where(self.df[col].notna().to_numpy(), row_numbers, -1))
+                               for col in self.df.columns if col != key_col}
+            # Float columns are gathered straight from their arrays, NaN standing in for no value
+            self.float_values = {col: self.df[col].to_numpy() for col in self.df.columns
+                                 if col != key_col and pd.api.types.is_float_dtype(self.df[col])}
+
+    def _latest_rows(self, date, start=None):
+        """Sorted row of every key's latest row at or before date (and not before start), and the keys that have one."""
+        n_dates = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date)), side='right')
+        rows = np.searchsorted(self.positions, np.arange(len(self.keys)) * len(self.dates) + n_dates) - 1
+        found = rows >= self.key_starts
+        if start is not None:
+            found &= self.sorted_dates[np.maximum(rows, 0)] >= np.datetime64(pd.Timestamp(start))
+        return rows[found], found
+
+    def latest(self, date, start=None):
+        """
+        One row per key: its latest row with start <= date_col <= date, with the frame's
+        columns. Keys with no row in that range are left out. The rows keep the frame's
+        order, as filtering it would; with skipna they are in key order, as groupby's.
+        """
+        rows, found = self._latest_rows(date, start)
+        if not self.skipna:
+            rows = rows[np.argsort(self.frame_rows[rows], kind='stable')]
+            return self.df.iloc[rows].reset_index(drop=True)
+
+        key_starts = self.key_starts[found]
+        start = None if start is None else np.datetime64(pd.Timestamp(start))
+        result = {}
+        for col in self.df.columns:
+            if col == self.key_col:
+                result[col] = self.df[col].iloc[rows].reset_index(drop=True)
+                continue
+            source = self.last_valid[col][rows]
+            valid = source >= key_starts
+            if start is not None:
+                valid &= self.sorted_dates[np.maximum(source, 0)] >= start
+            if col in self.float_values:
+                result[col] = np.where(valid, self.float_values[col][np.maximum(source, 0)], np.nan)
+            else:
+                result[col] = self.df[col].iloc[np.maximum(source, 0)].reset_index(drop=True).where(valid)
+        return pd.DataFrame(result)
+
+    def last(self):
+        """Every key's latest row."""
+        return self.latest(self.dates[-1]) if len(self.dates) else self.df.iloc[:0]
+
+    def on(self, date):
+        """One row per key with a row on the calendar day of date (its latest on that day)."""
+        day = pd.Timestamp(date).normalize()
+        return self.latest(day + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns'), start=day)
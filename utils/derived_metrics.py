@@ -0,0 +1,47 @@
+import pandas as pd
+
+# Rows per moving average: one week of daily reports
+WINDOW = 7
+
+def _grouped_rolling_mean(values, keys, window):
+    return values.groupby(keys, sort=False).rolling(window).mean().reset_index(level=0, drop=True)
+
+def _grouped_pct_change(values, keys):
+    """Series.pct_change() per key, with missing values carried forward as pandas does by default."""
+    filled = values.groupby(keys, sort=False).ffill()
+    return filled / filled.groupby(keys, sort=False).shift() - 1
+
+def derive_testing_metrics(df, key_col="country", date_col="date", window=WINDOW):
+    """
+    Testing ratios, rates and moving averages for every country in one grouped pass.
+
+    Returns df sorted by key_col and date_col with the added columns positivity_rate
+    (new cases per test, only where tests were reported), tests_per_case, cases_per_test,
+    case_fatality_rate (%), the window-day averages new_tests_7day_avg / tests_7day_avg,
+    cases_7day_avg, deaths_7day_avg, tests_per_case_7day and cases_per_test_7day, and
+    the day-over-day changes cases_change and tests_change. Averages and changes never
+    cross from one country into the next, so any country and date range can be sliced
+    out of the result as is.
+    """
+    df = df.sort_values([key_col, date_col], kind="stable").reset_index(drop=True)
+    keys = df[key_col]
+    cases, tests, deaths = df["new_cases"], df["new_tests"], df["new_deaths"]
+
+    metrics = {
+        "positivity_rate": (cases / tests).where(tests > 0),
+        "tests_per_case": tests / cases,
+        "cases_per_test": cases / tests,
+        "case_fatality_rate": deaths / cases * 100,
+    }
+    tests_avg = _grouped_rolling_mean(tests, keys, window)
+    metrics.update({
+        "new_tests_7day_avg": tests_avg,
+        "tests_7day_avg": tests_avg,
+        "cases_7day_avg": _grouped_rolling_mean(cases, keys, window),
+        "deaths_7day_avg": _grouped_rolling_mean(deaths, keys, window),
+        "tests_per_case_7day": _grouped_rolling_mean(metrics["tests_per_case"], keys, window),
+        "cases_per_test_7day": _grouped_rolling_mean(metrics["cases_per_test"], keys, window),
+        "cases_change": _grouped_pct_change(cases, keys),
+        "tests_change": _grouped_pct_change(tests, keys),
+    })
+    return df.assign(**metrics)
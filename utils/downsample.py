@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.io.json import to_json_plotly
+
+from utils.render import plotly_chart
+
+# Width assumed for charts that fill the page, and the points kept per pixel of it
+DEFAULT_CHART_WIDTH = int(os.environ.get('DOWNSAMPLE_CHART_WIDTH', 1000))
+POINTS_PER_PIXEL = float(os.environ.get('DOWNSAMPLE_POINTS_PER_PIXEL', 0.5))
+# DOWNSAMPLE_EXACT=1 (or ?exact=true in the URL) sends every point of every chart
+EXACT = os.environ.get('DOWNSAMPLE_EXACT', '').lower() in ('1', 'true', 'yes')
+
+# Per-point trace attributes that are thinned together with x and y
+POINT_ATTRIBUTES = ['x', 'y', 'customdata', 'text', 'hovertext', 'ids']
+MARKER_ATTRIBUTES = ['color', 'size', 'symbol', 'opacity']
+# Points of every trace serialized to estimate the payload of its non-numeric arrays
+PAYLOAD_SAMPLE_POINTS = 100
+
+def point_budget(fig):
+    """Points kept per series: proportional to the chart's width in pixels."""
+    width = fig.layout.width or DEFAULT_CHART_WIDTH
+    return max(3, int(width * POINTS_PER_PIXEL))
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out of the points (x, y) that keep the
+    series' shape. The first and last points are kept; every bucket in between keeps the
+    point forming the largest triangle with the point kept before it and the average of
+    the next bucket, so peaks and troughs survive.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average point of every bucket after the first, and of the last point alone
+    starts = np.r_[edges[1:-1], n - 1]
+    widths = np.diff(np.r_[starts, n])
+    avg_x = (np.add.reduceat(x, starts) / widths).tolist()
+    avg_y = (np.add.reduceat(y, starts) / widths).tolist()
+
+    # Buckets hold a few points each, so the sequential scan is cheapest on Python floats
+    xs, ys, edges = x.tolist(), y.tolist(), edges.tolist()
+    selected = [0]
+    a = 0
+    for i in range(n_out - 2):
+        xa, ya = xs[a], ys[a]
+        dx, dy = xa - avg_x[i], avg_y[i] - ya
+        best, best_area = edges[i], -1.0
+        for j in range(edges[i], edges[i + 1]):
+            area = abs(dx * (ys[j] - ya) - (xa - xs[j]) * dy)
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        selected.append(a)
+    selected.append(n - 1)
+    return np.array(selected, dtype=np.int64)
+
+def _as_numbers(x):
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    if x.dtype.kind in 'iuf':
+        return x.astype(float)
+    try:
+        return pd.to_datetime(x).asi8.astype(float)
+    except (ValueError, TypeError):
+        # Categories are spaced evenly
+        return np.arange(len(x), dtype=float)
+
+def series_indices(x, y, n_out):
+    """LTTB over the points with x and y, keeping the first missing point of every gap so lines still break there."""
+    x_numbers = _as_numbers(x)
+    y_numbers = pd.to_numeric(pd.Series(np.asarray(y)), errors='coerce').to_numpy(dtype=float)
+    valid = ~(np.isnan(x_numbers) | np.isnan(y_numbers))
+    if valid.all():
+        return lttb(x_numbers, y_numbers, n_out)
+    rows = np.flatnonzero(valid)
+    kept = rows[lttb(x_numbers[rows], y_numbers[rows], n_out)]
+    gap_starts = np.flatnonzero(~valid & np.r_[True, valid[:-1]])
+    return np.union1d(kept, gap_starts)
+
+def _point_arrays(trace):
+    """The trace's per-point attributes, as {attribute: values}."""
+    n = len(trace.y) if trace.y is not None and np.ndim(trace.y) > 0 else 0
+    arrays = {attribute: trace[attribute] for attribute in POINT_ATTRIBUTES
+              if trace[attribute] is not None and np.ndim(trace[attribute]) > 0 and len(trace[attribute]) == n}
+    if 'marker' in trace:
+        arrays.update({f'marker.{attribute}': trace.marker[attribute] for attribute in MARKER_ATTRIBUTES
+                       if trace.marker[attribute] is not None and np.ndim(trace.marker[attribute]) > 0
+                       and len(trace.marker[attribute]) == n})
+    return n, arrays
+
+def _thin(trace, n_out):
+    """The trace's points reduced to about n_out, or None when it is not a long line trace."""
+    if trace.type not in ('scatter', 'scattergl') or 'lines' not in (trace.mode or 'lines'):
+        return None
+    if trace.x is None or trace.y is None or len(trace.y) <= n_out or len(trace.x) != len(trace.y):
+        return None
+    keep = series_indices(trace.x, trace.y, n_out)
+    return {attribute: np.asarray(values)[keep] for attribute, values in _point_arrays(trace)[1].items()}
+
+def _is_numeric(values):
+    return isinstance(values, np.ndarray) and values.dtype.kind in 'iuf'
+
+def point_payload(fig):
+    """
+    Estimated bytes the figure's per-point data adds to the JSON payload, from every
+    trace's point count and the size of one point, so the full figure is never serialized
+    just for the caption. Numeric arrays are sent base64-encoded; the other arrays of a
+    trace are measured together on their first PAYLOAD_SAMPLE_POINTS values.
+    """
+    total = 0.0
+    for trace in fig.data:
+        n, arrays = _point_arrays(trace)
+        if n == 0:
+            continue
+        total += n * sum(values.dtype.itemsize * 4 / 3 for values in arrays.values() if _is_numeric(values))
+        sample = {attribute: values[:PAYLOAD_SAMPLE_POINTS] for attribute, values in arrays.items()
+                  if not _is_numeric(values)}
+        if sample:
+            total += len(to_json_plotly(sample)) * n / min(n, PAYLOAD_SAMPLE_POINTS)
+    return total
+
+def downsample_figure(fig, n_out=None):
+    """
+    A copy of fig with every line trace longer than n_out points (the chart's point
+    budget by default) reduced with LTTB, and the numbers of points before and after.
+    fig itself is left unchanged, so cached figures can be passed in.
+    """
+    n_out = n_out or point_budget(fig)
+    small = go.Figure(fig)
+    before = after = 0
+    for trace in small.data:
+        n = len(trace.y) if trace.y is not None and np.ndim(trace.y) > 0 else 0
+        updates = _thin(trace, n_out)
+        for attribute, values in (updates or {}).items():
+            trace[attribute] = values
+        before += n
+        after += len(trace.y) if updates is not None else n
+    return small, before, after
+
+def exact_requested():
+    return EXACT or st.query_params.get('exact', '').lower() in ('1', 'true', 'yes')
+
+def downsampled_chart(fig, key, n_out=None, **kwargs):
+    """
+    plotly_chart with the chart's line traces downsampled with LTTB, a toggle to send
+    every point instead, and a caption with the points and the estimated payload sent.
+    Downsampling is switched off for every chart by DOWNSAMPLE_EXACT=1 or ?exact=true in
+    the URL.
+    """
+    if exact_requested():
+        return plotly_chart(fig, **kwargs)
+    exact = st.toggle("Show every point", value=False, key=f'{key}_exact',
+                      help="Send all points to the browser instead of a shape-preserving sample")
+    if exact:
+        st.caption(f"All points · point data ~{point_payload(fig) / 1024:,.0f} KB")
+        return plotly_chart(fig, **kwargs)
+    small, before, after = downsample_figure(fig, n_out)
+    if after < before:
+        st.caption(f"{after:,} of {before:,} points shown · point data "
+                   f"~{point_payload(fig) / 1024:,.0f} KB → ~{point_payload(small) / 1024:,.0f} KB")
+    return plotly_chart(small, **kwargs)
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.entity_types import KNOWN_NAMES, entity_type
+from utils.tables import read_table, table_mtime
+
+# Built by Data Processing/entities.py
+ENTITIES_FILE_PATH = os.path.join("Datasets", "Entities", "entities.csv")
+
+@st.cache_data
+def read_entities(version):
+    return read_table(ENTITIES_FILE_PATH).set_index("country")
+
+def load_entities():
+    """
+    The entity dimension indexed by name: iso3, continent, entity_type, is_aggregate, latitude,
+    longitude. None when it has not been built; the lookups below then classify the names
+    with entity_type().
+    """
+    version = table_mtime(ENTITIES_FILE_PATH)
+    return read_entities(version) if version is not None else None
+
+def entities_of_type(*entity_types, names=None):
+    """
+    Names of the entities of the given types (country, continent, income_group, world, region):
+    those in the dimension, plus those of names (e.g. a dataset's country column) that it does
+    not contain. Without a dimension or names, only the fixed continent, income group and
+    World names are known.
+    """
+    entities = load_entities()
+    if entities is None:
+        result = [name for entity in entity_types for name in KNOWN_NAMES.get(entity, [])]
+    else:
+        result = entities.index[entities["entity_type"].isin(entity_types)].tolist()
+    if names is not None:
+        known = set(result) if entities is None else set(entities.index).union(result)
+        result += [name for name in pd.unique(pd.Series(names).dropna())
+                   if name not in known and entity_type(name) in entity_types]
+    return result
+
+def entity_flags(countries, flags, default):
+    """
+    Looks up a per-entity boolean Series (indexed by name) for every row of countries.
+    The column is reduced to integer codes (its own categories when it is categorical),
+    the flags are looked up once per distinct name and then gathered by code. Names not in
+    the dimension get default(name), missing names get False.
+    """
+    countries = pd.Series(countries)
+    if isinstance(countries.dtype, pd.CategoricalDtype):
+        codes, names = countries.cat.codes.to_numpy(), countries.cat.categories
+    else:
+        codes, names = pd.factorize(countries)
+    lookup = flags.reindex(names)
+    unknown = lookup.isna().to_numpy()
+    lookup = lookup.to_numpy(dtype=object)
+    lookup[unknown] = [default(name) for name in names[unknown]]
+    # Code -1 (a missing name) picks the trailing False
+    return np.append(lookup.astype(bool), False)[codes]
+
+def is_aggregate(countries):
+    """True for the rows of countries that name a continent, income group, World or another aggregate."""
+    entities = load_entities()
+    flags = pd.Series(dtype=bool) if entities is None else entities["is_aggregate"].astype(bool)
+    return entity_flags(countries, flags, lambda name: entity_type(name) != "country")
+
+def countries_only(df, column="country"):
+    """The rows of df whose column names a country rather than an aggregate."""
+    return df[~is_aggregate(df[column])]
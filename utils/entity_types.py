@@ -0,0 +1,33 @@
+"""
+Classifies country and aggregate names for the entity dimension.
+
+Aggregates are recognised by exact name or by the OWID naming patterns below, not by
+substrings, so countries like South Africa, American Samoa or Reunion stay countries.
+Used by Data Processing/entities.py to build the dimension, and by utils/entities.py for
+names the dimension does not contain (or when it has not been built).
+"""
+import re
+
+CONTINENTS = ['Africa', 'Asia', 'Europe', 'North America', 'South America', 'Oceania']
+INCOME_GROUPS = ['High-income countries', 'Upper-middle-income countries',
+                 'Lower-middle-income countries', 'Low-income countries']
+WORLD = 'World'
+REGIONS = ['European Union (27)', 'International']
+# "Asia excl. China", "World excl. China and South Korea", "Africa (WHO)", "Europe (UN)", ...
+REGION_PATTERN = re.compile(r'\bexcl\.|\((?:WHO|WB|UN)\)$|\bregion\b', re.IGNORECASE)
+
+ENTITY_TYPES = ['country', 'continent', 'income_group', 'world', 'region']
+
+def entity_type(name):
+    if name in CONTINENTS:
+        return 'continent'
+    if name in INCOME_GROUPS:
+        return 'income_group'
+    if name == WORLD:
+        return 'world'
+    if name in REGIONS or REGION_PATTERN.search(name):
+        return 'region'
+    return 'country'
+
+# The names of these types are fixed, so they are known without a dataset to scan
+KNOWN_NAMES = {'continent': CONTINENTS, 'income_group': INCOME_GROUPS, 'world': [WORLD]}
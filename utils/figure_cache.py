@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from utils.tables import table_mtime
+
+# Most figures kept across all sessions before the least recently used ones are dropped
+MAX_FIGURES = int(os.environ.get('FIGURE_CACHE_MAX_FIGURES', 256))
+
+class FigureCache:
+    """
+    Finished Plotly figures keyed by (figure name, dataset version, widget parameters).
+    A hit returns the stored figure as is, without running pandas or plotly.express again.
+    Figures are shared between sessions, so callers must not modify a returned figure.
+    """
+    def __init__(self, max_figures=MAX_FIGURES):
+        self.max_figures = max_figures
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def get(self, name, version, params, build):
+        key = (name, version, _freeze(params))
+        with self.lock:
+            entry = self.figures.get(key)
+            if entry is not None:
+                self.figures.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+                return entry[0]
+
+        start = time.perf_counter()
+        fig = build()
+        seconds = time.perf_counter() - start
+        with self.lock:
+            self.figures[key] = (fig, seconds)
+            self.misses += 1
+            self.build_seconds += seconds
+            while len(self.figures) > self.max_figures:
+                self.figures.popitem(last=False)
+        return fig
+
+    def stats(self):
+        with self.lock:
+            return {'figures': len(self.figures), 'hits': self.hits, 'misses': self.misses,
+                    'build_seconds': self.build_seconds, 'saved_seconds': self.saved_seconds}
+
+def _freeze(value):
+    """Hashable form of widget values (lists, dicts, dates, ...)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple(_freeze(v) for v in value)
+        return tuple(sorted(items, key=repr)) if isinstance(value, (set, frozenset)) else items
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+def dataset_version(*paths):
+    """Version of the datasets a figure is built from: the modification times of their files."""
+    return tuple(table_mtime(path) for path in paths)
+
+def cached_figure(name, version, params, build):
+    """Returns the figure for name, version and params from the process-wide cache, building it with build() on a miss."""
+    return get_figure_cache().get(name, version, params, build)
+
+def show_stats():
+    stats = get_figure_cache().stats()
+    st.sidebar.caption(f"Figure cache: {stats['hits']} hits, {stats['misses']} misses, "
+                       f"{stats['figures']} figures, ~{stats['saved_seconds']:.1f}s of rebuilding saved")
@@ -0,0 +1,46 @@
+import functools
+import time
+from collections import deque
+
+import streamlit as st
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+LOGGER = get_logger(__name__)
+
+# Fragment runs kept per session for the sidebar log
+MAX_LOGGED_RUNS = 50
+
+def _fragment_rerun():
+    """True while Streamlit reruns only fragments, after a widget inside one changed."""
+    ctx = get_script_run_ctx()
+    return bool(ctx and getattr(ctx, 'fragment_ids_this_run', None))
+
+def timed_fragment(func):
+    """
+    st.fragment that times every run of func. A change to a widget inside the fragment
+    reruns func alone instead of the whole page; each run is logged with its duration and
+    whether it ran with the page or on its own, so the log shows what an interaction
+    recomputed. func should take its data as arguments rather than read page globals.
+    """
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            milliseconds = (time.perf_counter() - start) * 1000
+            run = 'fragment rerun' if _fragment_rerun() else 'page run'
+            LOGGER.info("fragment %s: %s in %.1f ms", func.__name__, run, milliseconds)
+            if 'fragment_log' not in st.session_state:
+                st.session_state.fragment_log = deque(maxlen=MAX_LOGGED_RUNS)
+            st.session_state.fragment_log.append((func.__name__, run, milliseconds))
+    return st.fragment(timed)
+
+def show_fragment_log():
+    """The session's latest fragment runs, newest first, in the sidebar (refreshed on page runs)."""
+    runs = st.session_state.get('fragment_log')
+    if not runs:
+        return
+    with st.sidebar.expander("Fragment timings"):
+        st.caption("\n\n".join(f"{name}: {run}, {ms:,.1f} ms" for name, run, ms in reversed(runs)))
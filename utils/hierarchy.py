@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+AGE_GROUPS = ["< 40", "40 - 60", "> 60"]
+
+def age_groups(age):
+    """Bins numeric ages into AGE_GROUPS: under 40, 40 to 60 inclusive, over 60."""
+    age = np.asarray(age, dtype=float)
+    return pd.Categorical(np.select([age < 40, age <= 60], AGE_GROUPS[:2], default=AGE_GROUPS[2]),
+                          categories=AGE_GROUPS)
+
+def build_hierarchy(df, levels, value_col=None, root="Total", separator="-"):
+    """
+    Sunburst/treemap arrays for the nested categories in levels (outermost first), e.g.
+    ["gender", "age_group", "current_status"] or ["state", "district", "current_status"].
+
+    Rows are counted (or value_col is summed) once per leaf combination; every coarser level
+    is one more grouped sum over those leaf totals. Returns a DataFrame with one row per
+    node: id (the level values joined with separator, e.g. "M-< 40-Recovered"), parent
+    (the parent's id, or root), label (the node's own value) and value. The first row is
+    the root, whose parent is "".
+    """
+    grouped = df.groupby(levels, observed=True)
+    leaves = (grouped.size() if value_col is None else grouped[value_col].sum()).rename("value").reset_index()
+    leaves = leaves[leaves["value"] > 0]
+
+    nodes = [pd.DataFrame({"id": [root], "parent": [""], "label": [root], "value": [leaves["value"].sum()]})]
+    for depth in range(1, len(levels) + 1):
+        level = leaves.groupby(levels[:depth], observed=True, sort=True)["value"].sum().reset_index()
+        ids = level[levels[0]].astype(str)
+        parents = pd.Series(root, index=level.index)
+        for column in levels[1:depth]:
+            parents = ids
+            ids = ids + separator + level[column].astype(str)
+        nodes.append(pd.DataFrame({"id": ids, "parent": parents, "label": level[levels[depth - 1]].astype(str),
+                                   "value": level["value"]}))
+    return pd.concat(nodes, ignore_index=True)
@@ -0,0 +1,53 @@
+import os
+
+import plotly.graph_objects as go
+import streamlit as st
+
+# How scatter and line traces are drawn, for every page:
+#   auto   WebGL (Scattergl) once a chart's scatter traces reach WEBGL_MIN_POINTS points, SVG below
+#   webgl  always WebGL
+#   svg    always SVG
+# Set with the RENDER_MODE environment variable, or for one visit with ?render=... in the URL.
+RENDER_MODES = ('auto', 'webgl', 'svg')
+RENDER_MODE = os.environ.get('RENDER_MODE', 'auto').lower()
+WEBGL_MIN_POINTS = int(os.environ.get('WEBGL_MIN_POINTS', 1000))
+
+def render_mode():
+    mode = st.query_params.get('render', RENDER_MODE).lower()
+    return mode if mode in RENDER_MODES else 'auto'
+
+def _points(trace):
+    return len(trace.y) if trace.y is not None and hasattr(trace.y, '__len__') else 0
+
+def webgl_eligible(trace):
+    """Scatter traces Scattergl can draw the same way: not stacked areas and not spline lines."""
+    return (trace.type == 'scatter' and trace.stackgroup is None
+            and (trace.line is None or trace.line.shape != 'spline'))
+
+def apply_render_mode(fig, mode=None):
+    """
+    fig with its eligible scatter traces switched to Scattergl when the render mode asks
+    for WebGL, as a copy; fig itself is returned when nothing changes, so cached figures
+    are not copied for nothing. Animated figures keep SVG, since their frames must use the
+    same trace types as the data.
+    """
+    mode = mode or render_mode()
+    if mode == 'svg' or fig.frames:
+        return fig
+    eligible = [i for i, trace in enumerate(fig.data) if webgl_eligible(trace)]
+    if not eligible:
+        return fig
+    if mode == 'auto' and sum(_points(fig.data[i]) for i in eligible) < WEBGL_MIN_POINTS:
+        return fig
+
+    traces = list(fig.data)
+    for i in eligible:
+        props = traces[i].to_plotly_json()
+        props.pop('type', None)
+        # Attributes Scattergl lacks (cliponaxis, fillpattern, ...) are dropped
+        traces[i] = go.Scattergl(props, skip_invalid=True)
+    return go.Figure(data=traces, layout=fig.layout)
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart with the app's render mode applied to the figure."""
+    return st.plotly_chart(apply_render_mode(fig), **kwargs)
@@ -0,0 +1,25 @@
+import streamlit as st
+
+# Labels of every set of lazy tabs rendered in this process, by key, so the cache warm-up
+# can open each tab in turn
+TAB_LABELS = {}
+
+def lazy_tabs(labels, key):
+    """
+    st.tabs where only the selected tab's body runs. Switching tabs reruns the page with
+    the new tab open, and each body is guarded with `if is_open(tab):`, so the data and
+    figures of the hidden tabs are not computed; what a tab computes stays in the caches
+    for when it is opened again. The selected tab is kept under key by its label, so the
+    labels must not depend on other widgets.
+
+    Streamlit versions without stateful tabs get plain tabs, where every body runs.
+    """
+    TAB_LABELS[key] = list(labels)
+    try:
+        return st.tabs(labels, key=key, on_change='rerun')
+    except TypeError:
+        return st.tabs(labels)
+
+def is_open(tab):
+    """True for the selected tab of lazy_tabs, and for every tab when tabs are not stateful."""
+    return getattr(tab, 'open', None) is not False
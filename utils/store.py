@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+class CountryDateStore:
+    """
+    A dataset sorted once by (country, date), with the row range of every country.
+
+    A country's rows between two dates are found by a binary search inside its range and
+    returned as a slice of the sorted frame, without scanning or copying the other rows,
+    so selecting a few countries costs O(selected rows) instead of one full boolean mask
+    per country. The frame is shared: callers must not modify the returned slices.
+    """
+    def __init__(self, df, key_col="country", date_col="date"):
+        df = df[df[key_col].notna() & df[date_col].notna()]
+        codes, keys = pd.factorize(df[key_col], sort=True)
+        dates = pd.to_datetime(df[date_col]).to_numpy().astype("datetime64[ns]")
+
+        order = np.lexsort((dates, codes))
+        self.df = df.iloc[order].reset_index(drop=True)
+        self.dates = dates[order]
+        bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+        self.offsets = {key: (bounds[i], bounds[i + 1]) for i, key in enumerate(keys)}
+
+        # Row where every country first appears in the given frame, so multi-country
+        # selections list the countries in the same order as filtering the frame would
+        first_rows = np.full(len(keys), len(codes))
+        np.minimum.at(first_rows, codes, np.arange(len(codes)))
+        self.first_rows = dict(zip(keys, first_rows))
+
+    def countries(self):
+        return list(self.offsets)
+
+    def bounds(self, country, start=None, end=None):
+        """Row range of the country's rows with start <= date <= end in the sorted frame."""
+        lo, hi = self.offsets.get(country, (0, 0))
+        dates = self.dates[lo:hi]
+        first = lo if start is None else lo + np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side="left")
+        last = hi if end is None else lo + np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side="right")
+        return first, max(first, last)
+
+    def slice(self, country, start=None, end=None):
+        """The country's rows with start <= date <= end, in date order."""
+        first, last = self.bounds(country, start, end)
+        return self.df.iloc[first:last]
+
+    def select(self, countries, start=None, end=None):
+        """The rows of several countries with start <= date <= end, one country after another."""
+        countries = sorted((country for country in set(countries) if country in self.offsets), key=self.first_rows.get)
+        if not countries:
+            return self.df.iloc[:0]
+        return pd.concat([self.slice(country, start, end) for country in countries])
@@ -0,0 +1,53 @@
+import functools
+import operator
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+def parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def read_table(csv_path, columns=None, **read_csv_kwargs):
+    """
+    Reads a dataset, preferring the typed Parquet copy the Data Processing scripts write next
+    to the CSV (same name, .parquet extension). The Parquet copy already has typed dates,
+    categorical countries and float32 metrics, so no CSV parsing or date inference is needed.
+    Falls back to the CSV when there is no Parquet copy or the CSV is newer.
+    """
+    path = parquet_path(csv_path)
+    if os.path.exists(path) and (not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(csv_path, usecols=columns, **read_csv_kwargs)
+
+def table_mtime(csv_path):
+    """Modification time of the newest copy (CSV or Parquet) of a dataset, or None if it has none."""
+    times = [os.path.getmtime(path) for path in (csv_path, parquet_path(csv_path)) if os.path.exists(path)]
+    return max(times) if times else None
+
+def is_current(derived_path, source_path):
+    """True if a table derived from source_path exists and was written after source_path last changed."""
+    derived_mtime, source_mtime = table_mtime(derived_path), table_mtime(source_path)
+    return derived_mtime is not None and (source_mtime is None or derived_mtime >= source_mtime)
+
+def read_parquet_slice(path, columns=None, date_col="date", start=None, end=None, key_col="country", keys=None,
+                       notnull=()):
+    """
+    Reads columns of a Parquet file for the rows with start <= date_col <= end, key_col in
+    keys (None leaves a bound or the keys open) and a value in every notnull column. The
+    projection and the filters are pushed down into the pyarrow dataset scan, so only the
+    requested columns are decoded and row groups whose statistics rule out every row are
+    skipped.
+    """
+    dataset = ds.dataset(path, format="parquet")
+    date_type = dataset.schema.field(date_col).type
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field(date_col) >= pa.scalar(pd.Timestamp(start), type=date_type))
+    if end is not None:
+        conditions.append(ds.field(date_col) <= pa.scalar(pd.Timestamp(end), type=date_type))
+    if keys is not None:
+        conditions.append(ds.field(key_col).isin(list(keys)))
+    conditions.extend(ds.field(col).is_valid() for col in notnull)
+    condition = functools.reduce(operator.and_, conditions) if conditions else None
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
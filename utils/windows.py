@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+def _period_keys(dates, period):
+    """
+    The year (2021) or the month as yyyymm (202103) of every date, typed as in the mobility
+    file; only used when the period keys are not stored with the rows.
+    """
+    dates = pd.DatetimeIndex(dates)
+    if period == "year":
+        return dates.year.to_numpy().astype("int16")
+    return (dates.year * 100 + dates.month).to_numpy().astype("int32")
+
+def _cumulative(values):
+    """Prefix sums with a leading 0, so the sum of values[i:j] is cum[j] - cum[i]."""
+    return np.concatenate([[0.0], np.cumsum(values)])
+
+class WindowAggregator:
+    """
+    Sums, counts and means of value columns over any [start, end] date window, across all
+    rows and per key (a column or a list of columns), from cumulative sums and counts
+    built once.
+
+    A window is two binary searches for its edges plus two lookups per series, so a
+    date-slider change costs O(log n) per series (O(keys * log n) for all keys at once)
+    however long the history is. Missing values count as 0 in sums and are left out of
+    counts and means, as in pandas. Sums differ from a direct pandas sum only by
+    floating-point rounding.
+
+    period_columns maps "year" and/or "month" to columns of df that already hold those period
+    keys (as written by Data Processing/mobility_data.py); other periods are derived from
+    the dates when by_period() first needs them.
+    """
+    def __init__(self, df, value_columns, key_col="country", date_col="date", period_columns=None):
+        df = df[df[date_col].notna()]
+        self.value_columns = list(value_columns)
+        dates = pd.to_datetime(df[date_col]).to_numpy().astype("datetime64[ns]")
+        values = {col: df[col].to_numpy(dtype=float) for col in self.value_columns}
+        stored_periods = {period: df[col].to_numpy() for period, col in (period_columns or {}).items()}
+
+        # Across all rows: one entry per distinct date
+        self.dates, date_ranks = np.unique(dates, return_inverse=True)
+        date_ranks = date_ranks.reshape(-1)
+        self.date_sums = {col: _cumulative(np.bincount(date_ranks, np.nan_to_num(v), len(self.dates)))
+                          for col, v in values.items()}
+        self.date_counts = {col: _cumulative(np.bincount(date_ranks, ~np.isnan(v), len(self.dates)))
+                            for col, v in values.items()}
+        self._date_periods = {}
+        # Every row of a date has the same period keys, so any of them labels the date
+        self._date_period_keys = {}
+        for period, labels in stored_periods.items():
+            self._date_period_keys[period] = np.empty(len(self.dates), dtype=labels.dtype)
+            self._date_period_keys[period][date_ranks] = labels
+
+        # Per key: rows sorted by (key, date), each at position key_code * n_dates + date_rank
+        if key_col is None:
+            return
+        keys = df[key_col] if isinstance(key_col, str) else pd.MultiIndex.from_frame(df[key_col])
+        codes, self.keys = pd.factorize(keys, sort=True)
+        has_key = codes >= 0
+        order = np.lexsort((dates[has_key], codes[has_key]))
+        self.key_codes = {key: code for code, key in enumerate(self.keys)}
+        self.positions = (codes[has_key].astype(np.int64) * len(self.dates) + date_ranks[has_key])[order]
+        self.row_dates = dates[has_key][order]
+        self.key_sums = {col: _cumulative(np.nan_to_num(v[has_key][order])) for col, v in values.items()}
+        self.key_counts = {col: _cumulative(~np.isnan(v[has_key][order])) for col, v in values.items()}
+        self._key_periods = {}
+        self._row_period_keys = {period: labels[has_key][order] for period, labels in stored_periods.items()}
+
+    def _date_range(self, start, end):
+        """Range of distinct dates with start <= date <= end."""
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side="left")
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side="right")
+        return lo, max(lo, hi)
+
+    def _key_rows(self, codes, start, end):
+        """Sorted row ranges of the given key codes within the window."""
+        lo, hi = self._date_range(start, end)
+        base = np.asarray(codes, dtype=np.int64) * len(self.dates)
+        return np.searchsorted(self.positions, base + lo), np.searchsorted(self.positions, base + hi)
+
+    def _reduce(self, sums, counts, first, last, how):
+        total = sums[last] - sums[first]
+        if how == "sum":
+            return total
+        count = counts[last] - counts[first]
+        if how == "count":
+            return count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+    def total(self, column, start=None, end=None, how="sum"):
+        """Sum (or count, or mean) of column over all rows in the window."""
+        lo, hi = self._date_range(start, end)
+        return float(self._reduce(self.date_sums[column], self.date_counts[column], lo, hi, how))
+
+    def daily(self, column, start=None, end=None, how="sum"):
+        """Sum (or count, or mean) of column over all rows of every date in the window, indexed by date."""
+        lo, hi = self._date_range(start, end)
+        days = np.arange(lo, hi)
+        values = self._reduce(self.date_sums[column], self.date_counts[column], days, days + 1, how)
+        return pd.Series(values, index=pd.DatetimeIndex(self.dates[lo:hi], name="date"), name=column)
+
+    def cumulative(self, column, start=None, end=None):
+        """Running sum of column from the start of the window, at every date in it."""
+        lo, hi = self._date_range(start, end)
+        sums = self.date_sums[column]
+        return pd.Series(sums[lo + 1:hi + 1] - sums[lo], index=pd.DatetimeIndex(self.dates[lo:hi], name="date"), name=column)
+
+    def per_key(self, column, start=None, end=None, how="sum"):
+        """Sum (or count, or mean) of column per key over the window, for the keys with rows in it, in key order."""
+        first, last = self._key_rows(np.arange(len(self.keys)), start, end)
+        values = self._reduce(self.key_sums[column], self.key_counts[column], first, last, how)
+        has_rows = last > first
+        return pd.Series(values[has_rows], index=self.keys[has_rows], name=column)
+
+    def by_period(self, column, period, start=None, end=None, how="mean", key=None):
+        """
+        Sum (or count, or mean) of column per period ("year" or "month") within the window,
+        over all rows or over one key's rows, indexed by period key. Periods without rows
+        in the window are left out.
+        """
+        if key is None:
+            lo, hi = self._date_range(start, end)
+            boundaries, labels = self._periods(self._date_periods, self.dates, period, stored=self._date_period_keys)
+            sums, counts = self.date_sums[column], self.date_counts[column]
+        else:
+            if key not in self.key_codes:
+                return pd.Series(dtype=float, name=column)
+            first, last = self._key_rows([self.key_codes[key]], start, end)
+            lo, hi = first[0], last[0]
+            boundaries, labels = self._periods(self._key_periods, self.row_dates, period, self.positions // len(self.dates),
+                                               stored=self._row_period_keys)
+            sums, counts = self.key_sums[column], self.key_counts[column]
+        if hi <= lo:
+            return pd.Series(dtype=float, name=column)
+
+        # Period starts strictly inside the window split it into one segment per period
+        inner = boundaries[np.searchsorted(boundaries, lo, side="right"):np.searchsorted(boundaries, hi, side="left")]
+        starts, ends = np.r_[lo, inner], np.r_[inner, hi]
+        values = self._reduce(sums, counts, starts, ends, how)
+        return pd.Series(values, index=pd.Index(labels[starts], name=period), name=column)
+
+    @staticmethod
+    def _periods(cache, dates, period, codes=None, stored=None):
+        """
+        Rows where a new period (or a new key) begins, and the period key of every row, taken
+        from the stored keys when there are any; built once per period.
+        """
+        if period not in cache:
+            labels = stored[period] if stored and period in stored else _period_keys(dates, period)
+            changes = labels[1:] != labels[:-1]
+            if codes is not None:
+                changes |= codes[1:] != codes[:-1]
+            cache[period] = (np.flatnonzero(changes) + 1, labels)
+        return cache[period]
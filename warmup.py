@@ -0,0 +1,98 @@
+"""
+Warms the dashboard's caches, then starts the Streamlit server in the same process.
+
+Every page is run once headlessly with its default widget values, then once more for each
+other tab of its lazy tabs. This loads the datasets the page reads into the st.cache_data
+and st.cache_resource caches, and puts the figures it builds into the figure cache. These
+caches are shared by every session of the process, so the first visitor gets the same
+cached data and figures as every later one. The warm-up time of every page is reported
+before the server starts.
+
+Pages are warmed one after another. A headless run installs Streamlit's process-wide
+runtime for its duration, so two runs cannot overlap.
+
+Run from the repository root instead of `streamlit run Home.py`:
+    python warmup.py                                  # warm every page, then serve
+    python warmup.py --server.port 8080               # other options go to streamlit run
+    python warmup.py --page Testing --page Mobility   # only warm the pages whose names contain these
+    python warmup.py --no-serve                       # only warm up and report the times
+"""
+import argparse
+import glob
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+from streamlit.web import cli
+
+from utils.figure_cache import get_figure_cache
+from utils.sections import TAB_LABELS
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_PATH = os.path.join(PROJECT_DIR, 'Home.py')
+PAGES_DIR = os.path.join(PROJECT_DIR, 'pages')
+
+def page_paths(names=None):
+    """The app's pages in sidebar order, or those whose file names contain one of names."""
+    paths = sorted(glob.glob(os.path.join(PAGES_DIR, '*.py')))
+    if names:
+        paths = [path for path in paths if any(name in os.path.basename(path) for name in names)]
+    return paths
+
+def warm_page(path, timeout):
+    """
+    Runs a page with its default widget values, then with each other tab of its lazy tabs
+    open. Returns the number of runs and the error messages they raised.
+    """
+    TAB_LABELS.clear()
+    app = AppTest.from_file(path, default_timeout=timeout)
+    app.run()
+    runs, errors = 1, [e.message for e in app.exception]
+    for key, labels in list(TAB_LABELS.items()):
+        for label in labels[1:]:
+            app.session_state[key] = label
+            app.run()
+            runs += 1
+            errors += [e.message for e in app.exception]
+    return runs, errors
+
+def warm_up(paths, timeout):
+    """Warms every page in paths and prints how long each took. Returns True if none failed."""
+    report = []
+    start = time.perf_counter()
+    for path in paths:
+        name = os.path.basename(path)
+        print(f"[{name}] warming up")
+        page_start = time.perf_counter()
+        try:
+            runs, errors = warm_page(path, timeout)
+        except Exception as e:
+            runs, errors = 0, [repr(e)]
+        seconds = time.perf_counter() - page_start
+        if errors:
+            print(f"[{name}] failed: {errors[0]}")
+        report.append((name, 'failed' if errors else 'warm', runs, seconds))
+
+    stats = get_figure_cache().stats()
+    print("-" * 60)
+    for name, status, runs, seconds in report:
+        print(f"{name:<45} {status:<7} {runs:>2} runs {seconds:6.1f}s")
+    print(f"{'total':<45} {'':<7} {sum(r[2] for r in report):>2} runs {time.perf_counter() - start:6.1f}s"
+          f" ({stats['figures']} figures cached)")
+    return all(status == 'warm' for _, status, _, _ in report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Warms the caches of every page, then starts the Streamlit server.')
+    parser.add_argument('--page', action='append', dest='pages', help='only warm pages whose file names contain this (repeatable)')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds allowed for one run of a page (default: 600)')
+    parser.add_argument('--no-serve', action='store_true', help='exit after the warm-up instead of starting the server')
+    args, streamlit_args = parser.parse_known_args()
+
+    os.chdir(PROJECT_DIR)
+    paths = page_paths(args.pages)
+    if not paths:
+        parser.error(f"no pages match {args.pages}")
+    # A page that fails to warm up is built on its first visit instead, so the server still starts
+    warm_up(paths, args.timeout)
+    if not args.no_serve:
+        cli.main(['run', HOME_PATH, *streamlit_args])